@@ -0,0 +1,61 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compare streaming Eagle extraction with reading the whole XML tree, as boards get more copper
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import eagle
+from synthetic import eagle_brd
+
+
+def read_tree(path):
+	# What extraction did before streaming: the full tree, then the same lookups
+	board = ET.parse(path)
+	layers = {l.attrib['number']: l.attrib['name'] for l in board.iter('layer')}
+	return [(e.attrib['name'], e.find(".//attribute[@name='LCSC']")) for e in board.iter('element')]
+
+
+def read_stream(path):
+	with redirect_stdout(io.StringIO()):
+		return eagle.get_components_by_layer(path)
+
+
+def measure(func, path):
+	start = time.perf_counter()
+	func(path)
+	elapsed = time.perf_counter() - start
+	tracemalloc.start()
+	func(path)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return elapsed, peak
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Benchmark Eagle board extraction')
+	parser.add_argument('-e', '--elements', type=int, default=2000)
+	parser.add_argument('-s', '--signals', type=int, nargs='+', default=[5000, 20000, 80000])
+	args = parser.parse_args()
+
+	for signals in args.signals:
+		fd, path = tempfile.mkstemp(suffix='.brd')
+		with os.fdopen(fd, 'w') as f:
+			f.write(eagle_brd(args.elements, signals))
+		try:
+			print('{0} signals, {1:.1f} MB'.format(signals, os.path.getsize(path) / 1e6))
+			for name, func in (('tree', read_tree), ('stream', read_stream)):
+				elapsed, peak = measure(func, path)
+				print('  {0:8s} {1:8.3f} s {2:8.1f} MB peak'.format(name, elapsed, peak / 1e6))
+		finally:
+			os.remove(path)
@@ -0,0 +1,114 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compare the streaming S-expression parser with the regex/groupdict parser it replaced
+
+from argparse import ArgumentParser
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kiutils.utils import sexpr
+from synthetic import kicad_pcb
+
+legacy_regex = r'''(?mx)
+	\s*(?:
+	(?P<brackl>\()|
+	(?P<brackr>\))|
+	(?P<num>[+-]?\d+\.\d+(?=[\ \)])|\-?\d+(?=[\ \)]))|
+	(?P<sq>"(?:[^"]|(?<=\\)")*"(?:(?=\))|(?=\s)))|
+	(?P<s>[^(^)\s]+)
+	)'''
+
+
+def legacy_parse_sexp(sexp):
+	stack = []
+	out = []
+	for termtypes in re.finditer(legacy_regex, sexp):
+		term, value = [(t, v) for t, v in termtypes.groupdict().items() if v][0]
+		if term == 'brackl':
+			stack.append(out)
+			out = []
+		elif term == 'brackr':
+			assert stack, "Trouble with nesting of brackets"
+			tmpout, out = out, stack.pop(-1)
+			out.append(tmpout)
+		elif term == 'num':
+			v = float(value)
+			if v.is_integer(): v = int(v)
+			out.append(v)
+		elif term == 'sq':
+			out.append(value[1:-1].replace(r'\"', '"'))
+		elif term == 's':
+			out.append(value)
+	assert not stack, "Trouble with nesting of brackets"
+	return out[0]
+
+
+def measure(func, repeat):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	tracemalloc.start()
+	func()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return result, best, peak
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Benchmark the KiCad S-expression parser')
+	parser.add_argument('-f', '--footprints', type=int, default=2000)
+	parser.add_argument('-s', '--segments', type=int, default=20000)
+	parser.add_argument('-z', '--zones', type=int, default=4)
+	parser.add_argument('-r', '--repeat', type=int, default=3)
+	parser.add_argument('--board', type=str, help='Use an existing .kicad_pcb instead of a synthetic one')
+	args = parser.parse_args()
+
+	if args.board:
+		path = args.board
+	else:
+		fd, path = tempfile.mkstemp(suffix='.kicad_pcb')
+		with os.fdopen(fd, 'w') as f:
+			f.write(kicad_pcb(args.footprints, args.segments, args.zones))
+	print('{0}: {1:.1f} MB'.format(path, os.path.getsize(path) / 1e6))
+
+	def run_legacy():
+		with open(path, 'r') as f:
+			return legacy_parse_sexp(f.read())
+
+	def run_string():
+		with open(path, 'r') as f:
+			return sexpr.parse_sexp(f.read())
+
+	def run_stream():
+		with open(path, 'r') as f:
+			return sexpr.parse_sexp(f)
+
+	def run_footprints():
+		with open(path, 'r') as f:
+			return sexpr.parse_sexp(f, {'footprint'})
+
+	try:
+		reference = None
+		for name, func in (('legacy', run_legacy), ('string', run_string), ('stream', run_stream),
+						   ('footprint', run_footprints)):
+			result, elapsed, peak = measure(func, args.repeat)
+			if reference is None:
+				reference = result
+			expected = reference
+			if func is run_footprints:
+				expected = [i for i in reference if not isinstance(i, list) or not i or isinstance(i[0], list) or i[0] == 'footprint']
+			same = 'same output' if result == expected else 'DIFFERENT OUTPUT'
+			print('{0:10s} {1:8.3f} s {2:8.1f} MB peak  {3}'.format(name, elapsed, peak / 1e6, same))
+	finally:
+		if not args.board:
+			os.remove(path)
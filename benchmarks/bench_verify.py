@@ -0,0 +1,99 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compare the stock and package checks of offline matching run row by row and as NumPy masks,
+# on their own and as part of the whole match
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import jlc, partdb
+from lib.partdb import PartDB, PartIndex, write_db
+from synthetic import catalogue
+
+# Values and part types as the board rules leave them, resistors get an ohm symbol
+BOM_LINES = (
+	('10KΩ', '0402', 'RESISTOR'), ('10KΩ', '0603', 'RESISTOR'), ('4.7KΩ', '0805', 'RESISTOR'), ('100Ω 1%', '0402', 'RESISTOR'),
+	('1MΩ', '', 'RESISTOR'), ('0Ω', '0603', 'RESISTOR'), ('100NF', '0402', 'CAPACITOR'), ('1UF 25V', '0603', 'CAPACITOR'),
+	('10UF', '0805', 'CAPACITOR'), ('22PF', '', 'CAPACITOR'), ('LED RED', '0603', 'LED'), ('LED', '', 'LED'),
+	('LM358', 'SOIC-8', ''), ('STM32F103C8T6', 'LQFP-48', ''), ('AMS1117-3.3', '', ''), ('AO3400', 'SOT-23', ''), ('NE555', '', ''),
+)
+
+
+def bom(quantities):
+	compos = {}
+	for i, (value, package, part_type) in enumerate(BOM_LINES):
+		for quantity in quantities:
+			names = ['X{0}_{1}_{2}'.format(i, quantity, j) for j in range(quantity)]
+			compos[(value, package, str(quantity))] = {'parts': [(n, 'top', (0, 0), 0) for n in names], 'type': part_type, 'jlc': {}}
+	return compos
+
+
+def filter_candidates(database, compos, nostock):
+	lines = [(sorted(database.word_rows(value) | database.model_rows(value)), 0 if nostock else len(data['parts']), package)
+			 for (value, package, quantity), data in compos.items()]
+	start = time.perf_counter()
+	kept = [database.filter_rows(rows, quantity, package) for rows, quantity, package in lines]
+	return time.perf_counter() - start, kept
+
+
+def match(database, compos, nostock):
+	results = []
+	start = time.perf_counter()
+	with redirect_stdout(io.StringIO()):
+		for (value, package, quantity), data in compos.items():
+			# The quantity only keeps lines apart in compos, it must not be taken for a part code
+			jlc.search({(value, package, ''): data}, database=database, nostock=nostock)
+			results.append(data['jlc']['code'])
+	return time.perf_counter() - start, results
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Benchmark offline part matching')
+	parser.add_argument('-n', '--parts', type=int, default=500000)
+	parser.add_argument('-q', '--quantities', type=int, nargs='+', default=[1, 20, 500])
+	parser.add_argument('-r', '--repeat', type=int, default=3)
+	args = parser.parse_args()
+
+	if partdb.numpy is None:
+		print('NumPy is not installed')
+		exit(1)
+
+	start = time.perf_counter()
+	fd, path = tempfile.mkstemp(suffix='.db')
+	os.close(fd)
+	write_db(path, PartIndex(catalogue(args.parts)))
+	print('{0} parts, {1:.1f} MB, built in {2:.1f} s'.format(args.parts, os.path.getsize(path) / 1e6,
+															   time.perf_counter() - start))
+	numpy = partdb.numpy
+	try:
+		database = PartDB(path)
+		compos = bom(args.quantities)
+		for nostock in (False, True):
+			for step, func in (('filter', filter_candidates), ('match', match)):
+				times = {}
+				for name in ('loop', 'numpy'):
+					partdb.numpy = numpy if name == 'numpy' else None
+					database._arrays = None
+					database._package_sets = {}
+					database._package_masks = {}
+					best = None
+					for _ in range(args.repeat):
+						elapsed, results = func(database, compos, nostock)
+						best = elapsed if best is None else min(best, elapsed)
+					times[name] = (best, results)
+				same = times['loop'][1] == times['numpy'][1]
+				print('{0} lines, {1}{2}: loop {3:.3f} s, numpy {4:.3f} s, {5:.1f}x{6}'.format(
+					len(compos), step, ' (nostock)' if nostock else '', times['loop'][0], times['numpy'][0],
+					times['loop'][0] / times['numpy'][0], '' if same else ', RESULTS DIFFER'))
+		database.close()
+	finally:
+		partdb.numpy = numpy
+		os.remove(path)
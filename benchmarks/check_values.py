@@ -0,0 +1,165 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Check the passive value parser on known spellings, then check on randomized BOM lines that
+# looking passives up by value finds every part text matching finds, with every backend
+
+from argparse import ArgumentParser
+import math
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.partdb import PartDB, PartIndex, write_db
+from lib.rules import resistor_value
+from lib.sqlitedb import SqlitePartDB, write_sqlite
+from lib.values import PART_KINDS, of_category, parse_value
+from synthetic import catalogue
+
+# Text, upper case, kind given by the part type, and the expected kind, value, tolerance and voltage
+CASES = (
+	('10KΩ', True, None, ('resistance', 1e4, None, None)),
+	('10kΩ ±1% 100mW', False, None, ('resistance', 1e4, 1.0, None)),
+	('10000Ω', True, None, ('resistance', 1e4, None, None)),
+	('4K7', True, None, ('resistance', 4.7e3, None, None)),
+	('2R2', True, None, ('resistance', 2.2, None, None)),
+	('0Ω', True, None, ('resistance', 0.0, None, None)),
+	('1MΩ', True, None, ('resistance', 1e6, None, None)),
+	('1mΩ', False, None, ('resistance', 1e-3, None, None)),
+	('10K 1%', True, 'resistance', ('resistance', 1e4, 1.0, None)),
+	('10K 1%', True, None, None),
+	('1M 5%', True, 'resistance', ('resistance', 1e6, 5.0, None)),
+	('RESISTORS 10KOHMS ±1% 100mW 0402', True, None, ('resistance', 1e4, 1.0, None)),
+	('100NF', True, None, ('capacitance', 1e-7, None, None)),
+	('100N', True, None, ('capacitance', 1e-7, None, None)),
+	('0.1UF', True, None, ('capacitance', 1e-7, None, None)),
+	('4N7', True, None, ('capacitance', 4.7e-9, None, None)),
+	('1UF 25V', True, None, ('capacitance', 1e-6, None, 25.0)),
+	('10MF', True, None, ('capacitance', 1e-2, None, None)),
+	('50V 100nF X7R ±10% 0402', False, None, ('capacitance', 1e-7, 10.0, 50.0)),
+	('1KV 100PF', True, None, ('capacitance', 1e-10, None, 1e3)),
+	('4.7U', True, 'inductance', ('inductance', 4.7e-6, None, None)),
+	('10UH', True, 'capacitance', ('inductance', 1e-5, None, None)),
+	('4.7UH ±20% 0805', True, None, ('inductance', 4.7e-6, 20.0, None)),
+	('1N4148', True, None, ('capacitance', 1.4148e-9, None, None)),  # Why only passive part types are looked up by value
+	('1N4148W', True, None, None),
+	('STM32F103C8T6', True, None, None),
+	('LED RED', True, None, None),
+)
+
+# Board spellings of the catalogue values, resistors then go through the board rules
+RESISTOR_SPELLINGS = {
+	'0Ω': ('0Ω', '0R'), '1Ω': ('1Ω', '1R'), '10Ω': ('10Ω', '10R'), '22Ω': ('22Ω',), '47Ω': ('47Ω', '47Ω 5%'),
+	'100Ω': ('100Ω', '100R'), '220Ω': ('220Ω',), '330Ω': ('330Ω',), '470Ω': ('470Ω',), '1kΩ': ('1KΩ', '1000Ω', '1K 1%'),
+	'2.2kΩ': ('2.2KΩ', '2K2', '2K2Ω'), '4.7kΩ': ('4.7KΩ', '4K7', '4.7K 1%'), '10kΩ': ('10KΩ', '10K 1%', '10K 5%'),
+	'22kΩ': ('22KΩ',), '47kΩ': ('47KΩ', '47K 5%'), '100kΩ': ('100KΩ',), '1MΩ': ('1MΩ', '1M 1%'),
+}
+CAPACITOR_SPELLINGS = {
+	'10pF': ('10PF', '10P'), '22pF': ('22PF',), '100pF': ('100PF', '100P 50V'), '1nF': ('1NF', '1N'), '10nF': ('10NF',),
+	'100nF': ('100NF', '100N', '0.1UF', '100NF 25V', '100NF 10%'), '1uF': ('1UF', '1U', '1UF 25V'), '2.2uF': ('2.2UF', '2U2'),
+	'4.7uF': ('4.7UF', '4U7', '4.7U 16V'), '10uF': ('10UF', '10U'), '22uF': ('22UF',),
+}
+
+
+def check_cases():
+	failed = 0
+	for text, upper, kind, expected in CASES:
+		found = parse_value(text, upper, kind)
+		ok = (found is None) == (expected is None)
+		if ok and found is not None:
+			ok = found.kind == expected[0] and math.isclose(found.value, expected[1], rel_tol=1e-9) \
+				 and found.tolerance == expected[2] and found.voltage == expected[3]
+		if not ok:
+			failed += 1
+			print('{0!r} (upper={1}, kind={2}): {3}, expected {4}'.format(text, upper, kind, found, expected))
+	print('{0} values parsed, {1} wrong'.format(len(CASES), failed))
+	return failed
+
+
+def random_lines(parts, count, seed):
+	# Value of a random resistor or capacitor spelt as on a board, with its package or another one
+	rnd = random.Random(seed)
+	lines = []
+	while len(lines) < count:
+		part = rnd.choice(parts)
+		spellings = RESISTOR_SPELLINGS if 'Resistor' in part.category else CAPACITOR_SPELLINGS
+		catalogue_value = next((v for v in spellings if v in part.describe.split(' ')
+								or v.replace('Ω', 'OHMS') in part.describe.split(' ')), None)
+		if catalogue_value is None:
+			continue
+		package = part.package if rnd.random() < 0.8 else rnd.choice(('0402', '0603', '0805'))
+		value = rnd.choice(spellings[catalogue_value])
+		if spellings is RESISTOR_SPELLINGS:
+			lines.append((resistor_value(value), package, 'RESISTOR'))
+		else:
+			lines.append((value, package, 'CAPACITOR'))
+	return lines
+
+
+def text_rows(table, value, package, kind):
+	# Rows _verify keeps by text matching: value words in the description or the value in the model,
+	# the package, and for resistors the words with their ohm symbols fixed
+	words = table.word_rows(value)
+	models = table.model_rows(value)
+	rows, no_stock, no_package = table.filter_rows(sorted(words | models), 0, package)
+	resistors = table.resistor_rows()
+	ohm = 'Ω' in value or 'OHM' in value.upper()
+	value_words = set(word.upper() for word in value.strip().split(' '))
+	return set(row for row in rows if (row in models or row not in resistors or value_words.issubset(table.desc_tokens(row, ohm)))
+			   and of_category(kind, table.part(row).category))
+
+
+def check_lines(tables, lines):
+	# Text matching also takes parts whose description names the package, like SOT-23 in SOT-23-5,
+	# the value lookup only takes parts of the package
+	missed = more = named = failed = 0
+	for value, package, part_type in lines:
+		kind = PART_KINDS[part_type]
+		passive = parse_value(value, upper=True, kind=kind)
+		if passive is None or passive.kind != kind:
+			failed += 1
+			print('{0!r} ({1}) is not read as {2}: {3}'.format(value, part_type, kind, passive))
+			continue
+		found = [set(table.passive_rows(passive, package)) for table in tables]
+		if any(rows != found[0] for rows in found):
+			failed += 1
+			print('{0!r} {1}: backends differ'.format(value, package))
+		text = text_rows(tables[0], value, package, kind)
+		other = set(row for row in text if tables[0].part(row).package.upper() != package)
+		named += bool(other)
+		text -= other
+		if not text <= found[0]:
+			missed += 1
+			print('{0!r} {1}: {2} parts found by text are not found by value'.format(value, package, len(text - found[0])))
+		elif found[0] - text:
+			more += 1
+	print('{0} lines, {1} find parts text matching missed, {2} miss parts text matching found, {3} wrong'.format(
+		len(lines), more, missed, failed))
+	print('{0} lines also found parts of another package named in their description by text'.format(named))
+	return missed + failed
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Check passive values are parsed and looked up like text matching would')
+	parser.add_argument('-n', '--parts', type=int, default=20000, help='Parts in the catalogue')
+	parser.add_argument('-l', '--lines', type=int, default=826, help='Randomized BOM lines')
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+
+	failed = check_cases()
+	parts = catalogue(args.parts)
+	index = PartIndex(parts)
+	with tempfile.TemporaryDirectory() as tmp:
+		write_db(os.path.join(tmp, 'parts.db'), index)
+		write_sqlite(os.path.join(tmp, 'parts.sqlite'), index)
+		database, sqlite = PartDB(os.path.join(tmp, 'parts.db')), SqlitePartDB(os.path.join(tmp, 'parts.sqlite'))
+		try:
+			passives = [p for p in parts if p.category.startswith(('Chip Resistor', 'Multilayer Ceramic Capacitors'))]
+			failed += check_lines((index, database, sqlite), random_lines(passives, args.lines, args.seed))
+		finally:
+			database.close()
+			sqlite.close()
+	exit(1 if failed else 0)
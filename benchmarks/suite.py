@@ -0,0 +1,171 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Time every hot path on synthetic boards and catalogue, save the results under the
+# current commit and compare them with the last results saved for another commit
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kiutils.board import Board
+from kiutils.utils import sexpr
+from lib import eagle, jlc, kicad
+from lib.partdb import PartIndex
+from bench_verify import bom
+from synthetic import catalogue, eagle_brd, kicad_pcb
+
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+MIN_SECONDS = 0.001  # Shorter times are too noisy to call a regression
+
+
+def best_of(func, repeat):
+	# Best time of repeat runs, the collector runs between them rather than during
+	times = []
+	for _ in range(repeat):
+		gc.collect()
+		start = time.perf_counter()
+		func()
+		times.append(time.perf_counter() - start)
+	return min(times)
+
+
+def quiet(func, *args, **kwargs):
+	with redirect_stdout(io.StringIO()):
+		return func(*args, **kwargs)
+
+
+def commit():
+	# Short hash of HEAD, marked dirty if tracked files were changed since
+	try:
+		head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+		dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT).returncode != 0
+	except (OSError, subprocess.CalledProcessError):
+		return 'unknown'
+	return head + '-dirty' if dirty else head
+
+
+def board_benchmarks(tmp, args):
+	path = os.path.join(tmp, 'board.kicad_pcb')
+	with open(path, 'w') as f:
+		f.write(kicad_pcb(args.footprints, args.segments, args.zones))
+	brd = os.path.join(tmp, 'board.brd')
+	with open(brd, 'w') as f:
+		f.write(eagle_brd(args.footprints, args.signals))
+
+	def parse(tokens=None):
+		with open(path, 'r') as f:
+			return sexpr.parse_sexp(f, tokens)
+
+	board = Board.from_file(path)
+	yield 'parse_sexp', lambda: parse()
+	yield 'parse_sexp footprints', lambda: parse({'footprint'})
+	yield 'Board.from_file', lambda: Board.from_file(path)
+	yield 'Board.to_sexpr', board.to_sexpr
+	yield 'kicad get_components', lambda: quiet(kicad.get_components_by_layer, path)
+	yield 'eagle get_components', lambda: quiet(eagle.get_components_by_layer, brd)
+
+
+def database_benchmarks(tmp, args):
+	index = PartIndex(catalogue(args.parts))
+	compos = bom(args.quantities)
+
+	def match(database):
+		for (value, package, quantity), data in compos.items():
+			data['jlc'] = {}
+			# The quantity only keeps lines apart in compos, it must not be taken for a part code
+			quiet(jlc.search, {(value, package, ''): data}, database=database)
+
+	cwd = os.getcwd()
+	os.chdir(tmp)  # Databases are read from the working directory
+	try:
+		for backend, (path, writer, reader) in jlc.DB_BACKENDS.items():
+			writer(path, index)
+			yield 'write_db ' + backend, lambda: writer(path, index)
+			yield 'load_db ' + backend, lambda: quiet(jlc.load_db, backend).close()
+			database = quiet(jlc.load_db, backend)
+			try:
+				# Lines are matched once first, later runs time a warm database
+				yield '_verify {0} ({1} lines)'.format(backend, len(compos)), lambda: match(database)
+			finally:
+				database.close()
+	finally:
+		os.chdir(cwd)
+
+
+def previous_results(params, current):
+	# Latest saved run of another commit with the same sizes
+	runs = []
+	for name in glob.glob(os.path.join(RESULTS, '*.json')):
+		with open(name) as f:
+			run = json.load(f)
+		if run['commit'] != current and run['params'] == params:
+			runs.append(run)
+	return max(runs, key=lambda r: r['date']) if runs else None
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Run every benchmark and compare with the last commit benchmarked')
+	parser.add_argument('-f', '--footprints', type=int, default=3000, help='Footprints of the KiCad board, elements of the Eagle one')
+	parser.add_argument('-s', '--segments', type=int, default=30000)
+	parser.add_argument('-z', '--zones', type=int, default=4)
+	parser.add_argument('--signals', type=int, default=20000, help='Signals of the Eagle board')
+	parser.add_argument('-n', '--parts', type=int, default=500000, help='Parts in the catalogue')
+	parser.add_argument('-q', '--quantities', type=int, nargs='+', default=[1, 20, 500])
+	parser.add_argument('-r', '--repeat', type=int, default=3)
+	parser.add_argument('-k', '--only', type=str, help='Only run benchmarks whose name contains this')
+	parser.add_argument('-t', '--threshold', type=float, default=1.2, help='Slowdown reported as a regression')
+	parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+	args = parser.parse_args()
+
+	params = {k: getattr(args, k) for k in ('footprints', 'segments', 'zones', 'signals', 'parts', 'quantities')}
+	current = commit()
+	previous = previous_results(params, current)
+	if previous:
+		print('Comparing with {0} ({1})'.format(previous['commit'], time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['date']))))
+
+	results = {}
+	regressions = 0
+	with tempfile.TemporaryDirectory() as tmp:
+		for group in (board_benchmarks, database_benchmarks):
+			for name, func in group(tmp, args):
+				if args.only and args.only not in name:
+					continue
+				func()  # Warm up, and fail before timing if it doesn't work
+				results[name] = best_of(func, args.repeat)
+				line = '{0:36s} {1:9.3f} s'.format(name, results[name])
+				before = previous and previous['results'].get(name)
+				if before:
+					ratio = results[name] / before
+					line += '  {0:6.2f}x'.format(ratio)
+					if ratio > args.threshold and results[name] > MIN_SECONDS:
+						line += '  REGRESSION'
+						regressions += 1
+				print(line, flush=True)
+
+	if not args.no_save:
+		os.makedirs(RESULTS, exist_ok=True)
+		path = os.path.join(RESULTS, current + '.json')
+		if os.path.exists(path):
+			# Runs of part of the benchmarks add to the results of the commit
+			with open(path) as f:
+				saved = json.load(f)
+			if saved['params'] == params:
+				results = dict(saved['results'], **results)
+		with open(path, 'w') as f:
+			json.dump({'commit': current, 'date': time.time(), 'python': platform.python_version(), 'params': params,
+					   'results': results}, f, indent=2)
+		print('Saved', os.path.relpath(path))
+	exit(1 if regressions else 0)
@@ -0,0 +1,207 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Synthetic inputs for the benchmarks, generated from a fixed seed so runs are comparable
+
+import random
+
+KICAD_PARTS = (
+	('Resistor_SMD', 'R_0402_1005Metric', 'R', ('10K', '4K7', '100R', '1M', '0R', '2R2 1%')),
+	('Resistor_SMD', 'R_0603_1608Metric', 'R', ('10K', '47K', '330R', '1K')),
+	('Capacitor_SMD', 'C_0402_1005Metric', 'C', ('100N', '1U', '10P', '4.7U')),
+	('Capacitor_SMD', 'C_0805_2012Metric', 'C', ('10U', '22U', '1U')),
+	('LED_SMD', 'LED_0603_1608Metric', 'D', ('RED', 'GREEN')),
+	('Inductor_SMD', 'L_0805_2012Metric', 'L', ('10UH', '4.7UH')),
+	('Package_SO', 'SOIC-8_3.9x4.9mm_P1.27mm', 'U', ('LM358', 'NE555')),
+	('Package_TO_SOT_SMD', 'SOT-23-5', 'U', ('AP2112K-3.3', 'XC6206P332MR')),
+	('Package_QFP', 'LQFP-48_7x7mm_P0.5mm', 'U', ('STM32F103C8T6',)),
+	('Crystal', 'Crystal_SMD_3225-4Pin_3.2x2.5mm', 'Y', ('8MHZ', '16MHZ')),
+	('Diode_SMD', 'D_SOD-123', 'D', ('1N4148W', 'BAT54')),
+	('Connector', 'USB_C_Receptacle-16_GCT', 'J', ('USB_C',)),
+)
+
+LAYERS = '''  (layers
+    (0 "F.Cu" signal)
+    (31 "B.Cu" signal)
+    (36 "B.SilkS" user "B.Silkscreen")
+    (37 "F.SilkS" user "F.Silkscreen")
+    (38 "B.Mask" user)
+    (39 "F.Mask" user)
+    (44 "Edge.Cuts" user)
+  )
+'''
+
+
+def _footprint(rnd, i, nets):
+	library, entry, prefix, values = rnd.choice(KICAD_PARTS)
+	layer = 'F.Cu' if rnd.random() < 0.7 else 'B.Cu'
+	side = layer[0]
+	ref = '{0}{1}'.format(prefix, i + 1)
+	value = rnd.choice(values)
+	x, y = rnd.uniform(0, 200), rnd.uniform(0, 150)
+	out = ['  (footprint "{0}:{1}" (layer "{2}")\n'.format(library, entry, layer),
+		   '    (tedit 5F68FEEE) (tstamp {0:08x}-0000-0000-0000-000000000000)\n'.format(i),
+		   '    (at {0:.4f} {1:.4f} {2})\n'.format(x, y, rnd.choice((0, 90, 180, 270))),
+		   '    (descr "{0} \\"{1}\\" footprint")\n'.format(entry, library),
+		   '    (property "Reference" "{0}")\n'.format(ref),
+		   '    (property "Value" "{0}")\n'.format(value)]
+	if rnd.random() < 0.3:
+		out.append('    (property "LCSC" "C{0}")\n'.format(rnd.randint(1000, 999999)))
+	out.append('    (attr smd)\n')
+	out.append('    (fp_text reference "{0}" (at 0 -1.5) (layer "{1}.SilkS")\n'.format(ref, side))
+	out.append('      (effects (font (size 1 1) (thickness 0.15)))\n')
+	out.append('      (tstamp {0:08x}-0000-0000-0000-000000000001)\n    )\n'.format(i))
+	out.append('    (fp_text value "{0}" (at 0 1.5) (layer "{1}.Fab")\n'.format(value, side))
+	out.append('      (effects (font (size 1 1) (thickness 0.15)))\n')
+	out.append('      (tstamp {0:08x}-0000-0000-0000-000000000002)\n    )\n'.format(i))
+	for j in range(4):
+		out.append('    (fp_line (start {0:.3f} -0.8) (end {1:.3f} 0.8) (layer "{2}.SilkS") (width 0.12) '
+				   '(tstamp {3:08x}-0000-0000-0001-{4:012x}))\n'.format(j * 0.5 - 1, j * 0.5 - 0.5, side, i, j))
+	for j in range(rnd.choice((2, 2, 3, 5, 8, 16, 48))):
+		net = rnd.randrange(len(nets))
+		out.append('    (pad "{0}" smd roundrect (at {1:.4f} 0) (size 0.6 0.65) (layers "{2}.Cu" "{2}.Paste" "{2}.Mask") '
+				   '(roundrect_rratio 0.25)\n      (net {3} "{4}") (tstamp {5:08x}-0000-0000-0002-{6:012x}))\n'
+				   .format(j + 1, j * 0.5, side, net, nets[net], i, j))
+	out.append('    (model "${KICAD6_3DMODEL_DIR}/' + library + '.3dshapes/' + entry + '.wrl"\n')
+	out.append('      (offset (xyz 0 0 0)) (scale (xyz 1 1 1)) (rotate (xyz 0 0 0))\n    )\n  )\n')
+	return ''.join(out)
+
+
+def kicad_pcb(footprints=2000, segments=20000, zones=4, seed=1):
+	"""Text of a KiCad 6 board with the given number of footprints, tracks and filled zones"""
+	rnd = random.Random(seed)
+	nets = [''] + ['Net-({0}-Pad{1})'.format(rnd.choice('RCUDL') + str(i), i % 4 + 1) for i in range(1, footprints)]
+	nets[1:4] = ['GND', '+3V3', '+5V']
+	out = ['(kicad_pcb (version 20211014) (generator pcbnew)\n\n',
+		   '  (general\n    (thickness 1.6)\n  )\n\n',
+		   '  (paper "A4")\n',
+		   '  (title_block\n    (title "Synthetic ^ board")\n    (rev "1")\n  )\n\n',
+		   LAYERS, '\n  (setup\n    (pad_to_mask_clearance 0)\n  )\n\n']
+	out.extend('  (net {0} "{1}")\n'.format(i, n) for i, n in enumerate(nets))
+	out.extend(_footprint(rnd, i, nets) for i in range(footprints))
+	for i in range(segments):
+		x, y = rnd.uniform(0, 200), rnd.uniform(0, 150)
+		out.append('  (segment (start {0:.4f} {1:.4f}) (end {2:.4f} {3:.4f}) (width 0.25) (layer "{4}") (net {5}) '
+				   '(tstamp {6:08x}-0000-0000-0003-000000000000))\n'
+				   .format(x, y, x + rnd.uniform(-5, 5), y + rnd.uniform(-5, 5), rnd.choice(('F.Cu', 'B.Cu')),
+						   rnd.randrange(len(nets)), i))
+	for i in range(zones):
+		layer = ('F.Cu', 'B.Cu')[i % 2]
+		out.append('  (zone (net 1) (net_name "GND") (layer "{0}") (tstamp {1:08x}-0000-0000-0004-000000000000) '
+				   '(hatch edge 0.508)\n'.format(layer, i))
+		out.append('    (connect_pads (clearance 0.508))\n    (min_thickness 0.254) (filled_areas_thickness no)\n')
+		out.append('    (fill yes (thermal_gap 0.508) (thermal_bridge_width 0.508))\n')
+		out.append('    (polygon\n      (pts\n        (xy 0 0) (xy 200 0) (xy 200 150) (xy 0 150)\n      )\n    )\n')
+		out.append('    (filled_polygon\n      (layer "{0}")\n      (pts\n'.format(layer))
+		for j in range(footprints * 5):
+			out.append('        (xy {0:.6f} {1:.6f}) (xy {2:.6f} {3:.6f})\n'.format(
+				rnd.uniform(0, 200), rnd.uniform(0, 150), rnd.uniform(0, 200), rnd.uniform(0, 150)))
+		out.append('      )\n    )\n  )\n')
+	out.append(')\n')
+	return ''.join(out)
+
+
+EAGLE_PARTS = (
+	('R0402', 'R', ('10K', '4K7', '100R', '1M', '2R2 1%')),
+	('R0603', 'R', ('10K', '47K', '330R')),
+	('C0402', 'C', ('100N', '1U', '10P')),
+	('C0805', 'C', ('10U', '22U')),
+	('L0805', 'L', ('10UH', '4.7UH')),
+	('SOT23', 'Q', ('BC847', 'AO3400')),
+	('SOT-23-5', 'U', ('AP2112K-3.3',)),
+	('SOD123', 'D', ('1N4148W',)),
+	('SMA', 'D', ('SS14', 'M7')),
+	('SO08', 'U', ('LM358', 'NE555')),
+	('LQFP48-7X7MM', 'U', ('STM32F103C8T6',)),
+	('CHIPLED_0603', 'LED', ('RED', 'GREEN')),
+	('TP', 'TP', ('NC',)),
+)
+
+
+def eagle_brd(elements=2000, signals=5000, seed=1):
+	"""Text of an Eagle board with the given number of elements, routed signals and polygons"""
+	rnd = random.Random(seed)
+	out = ['<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE eagle SYSTEM "eagle.dtd">\n',
+		   '<eagle version="9.6.2">\n<drawing>\n<layers>\n']
+	for number, name in ((1, 'Top'), (16, 'Bottom'), (20, 'Dimension'), (21, 'tPlace'), (22, 'bPlace'), (25, 'tNames')):
+		out.append('<layer number="{0}" name="{1}" color="4" fill="1" visible="yes" active="yes"/>\n'.format(number, name))
+	out.append('</layers>\n<board>\n<plain>\n<wire x1="0" y1="0" x2="100" y2="0" width="0" layer="20"/>\n</plain>\n')
+	out.append('<libraries>\n<library name="synthetic">\n<packages>\n')
+	for package, prefix, values in EAGLE_PARTS:
+		out.append('<package name="{0}">\n<smd name="1" x="-0.5" y="0" dx="0.6" dy="0.5" layer="1"/>\n'
+				   '<smd name="2" x="0.5" y="0" dx="0.6" dy="0.5" layer="1"/>\n</package>\n'.format(package))
+	out.append('</packages>\n</library>\n</libraries>\n<elements>\n')
+	for i in range(elements):
+		package, prefix, values = rnd.choice(EAGLE_PARTS)
+		rot = rnd.choice(('', 'R90', 'R180', 'R270', 'MR0', 'MR90', 'MR180'))
+		out.append('<element name="{0}{1}" library="synthetic" package="{2}" value="{3}" x="{4:.2f}" y="{5:.2f}"{6}>\n'
+				   .format(prefix, i + 1, package, rnd.choice(values), rnd.uniform(0, 100), rnd.uniform(0, 80),
+						   ' rot="{0}"'.format(rot) if rot else ''))
+		if rnd.random() < 0.3:
+			out.append('<attribute name="LCSC" value="C{0}" x="0" y="0" size="1" layer="27" display="off"/>\n'
+					   .format(rnd.randint(1000, 999999)))
+		if rnd.random() < 0.05:
+			out.append('<attribute name="ROT" value="90" x="0" y="0" size="1" layer="27" display="off"/>\n')
+		out.append('</element>\n')
+	out.append('</elements>\n<signals>\n')
+	for i in range(signals):
+		out.append('<signal name="N${0}">\n'.format(i))
+		for j in range(2):
+			out.append('<contactref element="R{0}" pad="{1}"/>\n'.format(rnd.randint(1, elements), j + 1))
+		for j in range(rnd.randint(1, 6)):
+			out.append('<wire x1="{0:.3f}" y1="{1:.3f}" x2="{2:.3f}" y2="{3:.3f}" width="0.254" layer="{4}"/>\n'.format(
+				rnd.uniform(0, 100), rnd.uniform(0, 80), rnd.uniform(0, 100), rnd.uniform(0, 80), rnd.choice((1, 16))))
+		if i % 50 == 0:
+			out.append('<polygon width="0.254" layer="{0}" isolate="0.3">\n'.format(rnd.choice((1, 16))))
+			for j in range(200):
+				out.append('<vertex x="{0:.4f}" y="{1:.4f}"/>\n'.format(rnd.uniform(0, 100), rnd.uniform(0, 80)))
+			out.append('</polygon>\n')
+		out.append('</signal>\n')
+	out.append('</signals>\n</board>\n</drawing>\n</eagle>\n')
+	return ''.join(out)
+
+
+CATALOGUE_PACKAGES = ('0201', '0402', '0603', '0805', '1206', 'SOT-23', 'SOT-23-5', 'SOIC-8', 'QFN-32', 'LQFP-48',
+					  'SMA', 'SOD-123')
+RESISTOR_VALUES = ('0Ω', '1Ω', '10Ω', '22Ω', '47Ω', '100Ω', '220Ω', '330Ω', '470Ω', '1kΩ', '2.2kΩ', '4.7kΩ', '10kΩ',
+				   '22kΩ', '47kΩ', '100kΩ', '1MΩ')
+CAPACITOR_VALUES = ('10pF', '22pF', '100pF', '1nF', '10nF', '100nF', '1uF', '2.2uF', '4.7uF', '10uF', '22uF')
+IC_MODELS = ('STM32F103C8T6', 'LM358', 'AMS1117-3.3', 'NE555', 'TPS7A2033', 'MP2307', 'CH340G', 'AP2112K-3.3',
+			 'XC6206P332MR', 'SS14', '1N4148W', 'BAT54', 'AO3400', 'BC847')
+
+
+def catalogue(parts=500000, seed=1):
+	"""Parts shaped like the JLCPCB catalogue, sorted by price within each category like update_db does"""
+	from lib.partdb import Part
+	rnd = random.Random(seed)
+	categories = {}
+	for i in range(parts):
+		package = rnd.choice(CATALOGUE_PACKAGES)
+		kind = rnd.random()
+		if kind < 0.35:
+			value = rnd.choice(RESISTOR_VALUES)
+			if rnd.random() < 0.2 and value[-2:-1].isdigit():
+				value = value.replace('Ω', 'OHMS')
+			describe = '{0} {1} ±{2}% {3} Chip Resistor - Surface Mount ROHS'.format(
+				rnd.choice(('62.5mW', '100mW', '125mW')), value, rnd.choice((1, 5)), package)
+			if rnd.random() < 0.3:
+				describe = 'RESISTORS ' + describe
+			model = 'RC{0}FR-07{1}L'.format(package, value.rstrip('ΩOHMS').upper())
+			category = 'Chip Resistor - Surface Mount'
+		elif kind < 0.65:
+			describe = '{0} {1} X7R ±10% {2} Multilayer Ceramic Capacitors MLCC - SMD/SMT ROHS'.format(
+				rnd.choice(('16V', '25V', '50V')), rnd.choice(CAPACITOR_VALUES), package)
+			model = 'CL{0}B{1}KB'.format(package, rnd.randrange(10000))
+			category = 'Multilayer Ceramic Capacitors MLCC - SMD/SMT'
+		elif kind < 0.75:
+			describe = '{0} LED {1} ROHS'.format(rnd.choice(('Red', 'Green', 'Blue', 'White')), package)
+			model = 'LED-{0}-{1}'.format(package, rnd.randrange(1000))
+			category = 'Light Emitting Diodes (LED)'
+		else:
+			model = rnd.choice(IC_MODELS) + rnd.choice(('', '-TR', 'DR', 'N', str(rnd.randrange(100))))
+			describe = '{0} {1} ROHS'.format(model, package)
+			category = 'Integrated Circuits'
+		part = Part('C{0}'.format(i + 1), describe, model, package, rnd.random() < 0.1,
+					rnd.choice((0, 0, 5, 100, 2000, 50000)), round(rnd.uniform(0.0005, 2), 4), category)
+		categories.setdefault(category, []).append(part)
+	return [p for c in categories.values() for p in sorted(c, key=lambda p: p.price)]
@@ -16,7 +16,7 @@ Documentation taken from:
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable
 from os import path
 
 from kiutils.items.common import Group, Image, Net, PageSettings, TitleBlock
@@ -94,11 +94,14 @@ class Board():
     ``self.from_file()`` is used. Allows the use of ``self.to_file()`` without parameters."""
 
     @classmethod
-    def from_sexpr(cls, exp: list) -> Board:
+    def from_sexpr(cls, exp: list, tokens: Optional[Iterable[str]] = None) -> Board:
         """Convert the given S-Expresstion into a Board object
 
         Args:
             - exp (list): Part of parsed S-Expression ``(kicad_pcb ...)``
+            - tokens (Iterable[str], optional): Only load the top level tokens with these names,
+                                                for example ``('footprint',)``. The board's other
+                                                lists stay empty. Defaults to None (load everything).
 
         Raises:
             - Exception: When given parameter's type is not a list
@@ -113,8 +116,11 @@ class Board():
         if exp[0] != 'kicad_pcb':
             raise Exception("Expression does not have the correct type")
 
+        if tokens is not None:
+            tokens = set(tokens)
         object = cls()
         for item in exp:
+            if tokens is not None and item[0] not in tokens: continue
             if item[0] == 'version': object.version = item[1]
             if item[0] == 'generator': object.generator = item[1]
             if item[0] == 'general': object.general = GeneralSettings().from_sexpr(item)
@@ -147,7 +153,8 @@ class Board():
         return object
 
     @classmethod
-    def from_file(cls, filepath: str, encoding: Optional[str] = None) -> Board:
+    def from_file(cls, filepath: str, encoding: Optional[str] = None,
+                  tokens: Optional[Iterable[str]] = None) -> Board:
         """Load a board directly from a KiCad board file (`.kicad_pcb`) and sets the
         ``self.filePath`` attribute to the given file path.
 
@@ -155,6 +162,11 @@ class Board():
             - filepath (str): Path or path-like object that points to the file
             - encoding (str, optional): Encoding of the input file. Defaults to None (platform 
                                         dependent encoding).
+            - tokens (Iterable[str], optional): Only load the top level tokens with these names,
+                                                for example ``('footprint',)``. Other expressions
+                                                are skipped while parsing the file, so they cost
+                                                neither memory nor object creation. Defaults to
+                                                None (load everything).
 
         Raises:
             - Exception: If the given path is not a file
@@ -166,7 +178,9 @@ class Board():
             raise Exception("Given path is not a file!")
 
         with open(filepath, 'r', encoding=encoding) as infile:
-            item = cls.from_sexpr(sexpr.parse_sexp(infile.read()))
+            if tokens is not None:
+                tokens = set(tokens)
+            item = cls.from_sexpr(sexpr.parse_sexp(infile, tokens), tokens)
             item.filePath = filepath
             return item
 
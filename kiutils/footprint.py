@@ -934,9 +934,7 @@ class Footprint():
             raise Exception("Given path is not a file!")
 
         with open(filepath, 'r', encoding=encoding) as infile:
-            rawFootprint = infile.read()
-
-            fpData = sexpr.parse_sexp(rawFootprint)
+            fpData = sexpr.parse_sexp(infile)
             return cls.from_sexpr(fpData)
 
     @classmethod
@@ -160,7 +160,7 @@ class LibTable():
             raise Exception("Given path is not a file!")
 
         with open(filepath, 'r', encoding=encoding) as infile:
-            item = cls.from_sexpr(sexpr.parse_sexp(infile.read()))
+            item = cls.from_sexpr(sexpr.parse_sexp(infile))
             item.filePath = filepath
             return item
 
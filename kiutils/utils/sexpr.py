@@ -2,42 +2,178 @@
 # code extracted from: http://rosettacode.org/wiki/S-Expressions
 # Originally taken from: https://gitlab.com/kicad/libraries/kicad-library-utils/-/blob/master/common/sexpr.py
 
-import re
+# Characters ending a symbol or a number: brackets, carets and whitespace as ``str.isspace``
+# (and the ``\s`` of the regular expression the tokenizer used to be) sees it. Carets and
+# whitespace between tokens are dropped.
+_SPACE = frozenset(c for c in map(chr, range(0x110000)) if c.isspace())
+_STOP = _SPACE | frozenset('()^')
+_BLANK = _SPACE | frozenset('^')
+# Maps the characters above to NUL and NUL itself to another character, so the end of a
+# symbol is found with str.find in the translated buffer
+_STOP_TABLE = dict.fromkeys(map(ord, _STOP), 0)
+_STOP_TABLE[0] = 1
 
-dbg = False
+CHUNK_SIZE = 1 << 20
+"""Number of characters read at once when parsing from a file object"""
 
-term_regex = r'''(?mx)
-    \s*(?:
-        (?P<brackl>\()|
-        (?P<brackr>\))|
-        (?P<num>[+-]?\d+\.\d+(?=[\ \)])|\-?\d+(?=[\ \)]))|
-        (?P<sq>"(?:[^"]|(?<=\\)")*"(?:(?=\))|(?=\s)))|
-        (?P<s>[^(^)\s]+)
-       )'''
+def _chunks(sexp):
+    if isinstance(sexp, str):
+        yield sexp
+        return
+    while True:
+        chunk = sexp.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
 
-def parse_sexp(sexp):
+def _number(text):
+    """Value of a number token (``[+-]?\\d+\\.\\d+`` or ``-?\\d+``), None for other text"""
+    digits = text[1:] if text[0] in '+-' else text
+    if '.' in digits:
+        whole, _, fraction = digits.partition('.')
+        if not (whole.isdecimal() and fraction.isdecimal()):
+            return None
+        value = float(text)
+        return int(value) if value.is_integer() else value
+    if not digits.isdecimal() or text[0] == '+':
+        return None
+    if len(text) < 16:
+        return int(text)
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+def _string_end(buffer, start, end, eof):
+    """Position of the quote closing the string opened at ``start``, -1 if the token is not a
+    string, None if the buffer doesn't hold enough to tell. A string ends at a quote followed by a
+    closing bracket or whitespace, the last such one before the first quote not preceded by a
+    backslash."""
+    quote = buffer.find('"', start + 1)
+    while quote > 0 and buffer[quote - 1] == '\\':
+        quote = buffer.find('"', quote + 1)
+    if quote < 0 or quote + 1 == end:
+        if not eof:
+            return None
+        quote = buffer.rfind('"', start + 1, end - 1)
+    while quote > start and buffer[quote + 1] != ')' and buffer[quote + 1] not in _SPACE:
+        quote = buffer.rfind('"', start + 1, quote)
+    return quote if quote > start else -1
+
+def parse_sexp(sexp, tokens=None):
+    """Parse an S-Expression into nested lists
+
+    Args:
+        - sexp (str | file object): S-Expression as a string, or a text file object that is read
+                                    incrementally in chunks of ``CHUNK_SIZE`` characters
+        - tokens (set, optional): Names of the expressions to keep directly below the top level
+                                  one. Others are skipped without being built. Defaults to None
+                                  (keep everything).
+
+    Raises:
+        - AssertionError: When the brackets of the expression are not balanced
+
+    Returns:
+        - list: The first expression found in the input
+    """
+    return _parse(_chunks(sexp), tokens)
+
+def _parse(chunks, tokens):
     stack = []
     out = []
-    if dbg: print("%-6s %-14s %-44s %-s" % tuple("term value out stack".split()))
-    for termtypes in re.finditer(term_regex, sexp):
-        term, value = [(t,v) for t,v in termtypes.groupdict().items() if v][0]
-        if dbg: print("%-7s %-14s %-44r %-r" % (term, value, out, stack))
-        if   term == 'brackl':
-            stack.append(out)
-            out = []
-        elif term == 'brackr':
-            assert stack, "Trouble with nesting of brackets"
-            tmpout, out = out, stack.pop(-1)
-            out.append(tmpout)
-        elif term == 'num':
-            v = float(value)
-            if v.is_integer(): v = int(v)
-            out.append(v)
-        elif term == 'sq':
-            out.append(value[1:-1].replace(r'\"', '"'))
-        elif term == 's':
-            out.append(value)
+    buffer = ''
+    before = ' '  # Character before the buffer, to tell whether a quote at its start starts a token
+    eof = False
+    skip = 0
+    while not eof:
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
         else:
-            raise NotImplementedError("Error: %r" % (term, value))
-    assert not stack, "Trouble with nesting of brackets"
-    return out[0]
\ No newline at end of file
+            buffer += chunk
+        end = len(buffer)
+        stops = buffer.translate(_STOP_TABLE)
+        pos = 0
+        # Next closing bracket and quote while skipping, end if there are none
+        right = quote = -1
+        while True:
+            if skip:
+                # Count brackets up to the next quote starting a token, the string it may open is
+                # read as a token below so the brackets in it are not counted. Opening brackets are
+                # counted from one closing bracket to the next.
+                if right < pos:
+                    right = buffer.find(')', pos) % (end + 1)
+                if quote < pos:
+                    quote = buffer.find('"', pos) % (end + 1)
+                if right < quote:
+                    skip += buffer.count('(', pos, right) - 1
+                    pos = right + 1
+                    continue
+                skip += buffer.count('(', pos, quote)
+                pos = quote
+                if pos == end:
+                    break
+                if (buffer[pos - 1] if pos else before) not in _STOP:
+                    pos += 1  # Quote inside a symbol
+                    continue
+            else:
+                while pos < end and buffer[pos] in _BLANK:
+                    pos += 1
+                if pos == end:
+                    break
+            char = buffer[pos]
+            if char == '(':
+                pos += 1
+                if skip:
+                    skip += 1
+                    continue
+                stack.append(out)
+                out = []
+                continue
+            if char == ')':
+                pos += 1
+                if skip:
+                    skip -= 1
+                    continue
+                assert stack, "Trouble with nesting of brackets"
+                tmpout, out = out, stack.pop()
+                out.append(tmpout)
+                continue
+            if char == '"':
+                close = _string_end(buffer, pos, end, eof)
+                if close is None:
+                    break  # The string may end in the next chunk
+                if close > 0:
+                    value = buffer[pos + 1:close].replace(r'\"', '"')
+                    pos = close + 1
+                    if skip:
+                        continue
+                    if not out and tokens is not None and len(stack) == 2 and value not in tokens:
+                        out = stack.pop()
+                        skip = 1
+                        continue
+                    out.append(value)
+                    continue
+            # Symbol, or a number if followed by a space or a closing bracket
+            stop = stops.find('\0', pos + 1)
+            if stop < 0:
+                stop = end
+            if stop == end and not eof:
+                break  # The token may continue in the next chunk
+            start, pos = pos, stop
+            if skip:
+                continue
+            value = buffer[start:stop]
+            if stop < end and buffer[stop] in ' )' and (char in '+-' or char.isdecimal()):
+                number = _number(value)
+                if number is not None:
+                    value = number
+            if not out and tokens is not None and len(stack) == 2 and value not in tokens:
+                # Drop the expression opened by the last bracket along with its content
+                out = stack.pop()
+                skip = 1
+                continue
+            out.append(value)
+        if pos:
+            before = buffer[pos - 1]
+        buffer = buffer[pos:]
+    assert not stack and not skip, "Trouble with nesting of brackets"
+    return out[0]
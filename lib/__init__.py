@@ -1,6 +1,7 @@
 #!/bin/env python3
 # -*- coding: utf-8 -*-
 
-from .eagle import *
-from .jlc import *
-from .kicad import *
+# Modules only, their names clash (kicad and eagle both have get_components and rule tables)
+from . import cache, eagle, fetch, instrument, jlc, kicad, match, partdb, rules, sqlitedb, values, writers
+
+__all__ = ['cache', 'eagle', 'fetch', 'instrument', 'jlc', 'kicad', 'match', 'partdb', 'rules', 'sqlitedb', 'values', 'writers']
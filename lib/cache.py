@@ -0,0 +1,165 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+import msgspec
+import gzip
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .partdb import Part, PartIndex, desc_tokens, normalize_describe
+
+
+CACHE_FILE = 'cache.db'
+CACHE_TTL = 24 * 3600  # Seconds before cached stock and prices are considered stale
+CACHE_MAX_PARTS = 100000
+
+
+class CacheEntry(msgspec.Struct, array_like=True, gc=False):
+	part: Part
+	fetched: float
+	used: float
+	tokens: Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]] = None  # desc_tokens(), missing in older caches
+
+
+class QueryEntry(msgspec.Struct, array_like=True, gc=False):
+	fetched: float
+	codes: List[str]  # Empty when the keyword returned nothing
+
+
+class MatchEntry(msgspec.Struct, array_like=True, gc=False):
+	fetched: float
+	code: str  # Empty when nothing matched
+
+
+class CacheData(msgspec.Struct, array_like=True, gc=False):
+	parts: Dict[str, CacheEntry] = {}
+	queries: Dict[str, QueryEntry] = {}
+	matches: Dict[str, MatchEntry] = {}
+
+
+cache_decoder = msgspec.msgpack.Decoder(CacheData)
+
+
+def query_key(keyword, nostock, basic, limit):
+	return '{}|{:d}{:d}|{}'.format(keyword, nostock, basic, limit)
+
+
+def match_key(keyword, value, package, part_type, lcscpn, strict, nostock, basic, limit, quantity):
+	# The stock check depends on the quantity and passives are matched by value depending on the part type,
+	# so both are part of the key
+	return '{}|{}|{}|{}|{}|{:d}{:d}{:d}|{}|{}'.format(keyword, value, package, part_type, lcscpn, strict, nostock, basic, limit, quantity)
+
+
+class PartCache:
+	# Parts and keyword results found online. Changes are kept in memory and
+	# written once by flush(), which replaces the file atomically. Entries
+	# older than ttl are dropped on load, and the least recently used parts
+	# are evicted when there are more than max_parts.
+
+	def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_parts=CACHE_MAX_PARTS):
+		self.path = path
+		self.ttl = ttl
+		self.max_parts = max_parts
+		self.data = CacheData()
+		self._index = None
+		self.dirty = False
+
+	def __len__(self):
+		return len(self.data.parts)
+
+	@property
+	def index(self):
+		# Only built when a lookup isn't answered by the match cache
+		if self._index is None:
+			parts = self.data.parts
+			self._index = PartIndex((e.part for e in parts.values()), {c: e.tokens for c, e in parts.items() if e.tokens is not None})
+		return self._index
+
+	def load(self):
+		try:
+			with gzip.open(self.path, 'r') as f:
+				self.data = cache_decoder.decode(f.read())
+		except (FileNotFoundError, EOFError, gzip.BadGzipFile, msgspec.DecodeError):
+			print('No cache found')
+			self.data = CacheData()
+		else:
+			expired = self._expire(time.time() - self.ttl)
+			print('loaded {0} components from cache, {1} expired'.format(len(self.data.parts), expired))
+		self._index = None
+		self.dirty = False
+
+	def _expire(self, oldest):
+		parts = self.data.parts
+		count = len(parts)
+		self.data.parts = {code: e for code, e in parts.items() if e.fetched >= oldest}
+		self.data.queries = {k: q for k, q in self.data.queries.items() if q.fetched >= oldest}
+		self.data.matches = {k: m for k, m in self.data.matches.items() if m.fetched >= oldest}
+		self._drop_orphan_queries()
+		if count != len(self.data.parts):
+			self.dirty = True
+		return count - len(self.data.parts)
+
+	def _drop_orphan_queries(self):
+		# Searches and matches are only useful while all of their parts are still cached
+		parts = self.data.parts
+		self.data.queries = {k: q for k, q in self.data.queries.items() if all(c in parts for c in q.codes)}
+		self.data.matches = {k: m for k, m in self.data.matches.items() if not m.code or m.code in parts}
+
+	def update(self, parts):
+		now = time.time()
+		for code, part in parts.items():
+			self.data.parts[code] = CacheEntry(part, now, now, desc_tokens(normalize_describe(part.describe)))
+		if self._index is not None:
+			self._index.update(parts.values(), {code: self.data.parts[code].tokens for code in parts})
+		self.dirty = True
+
+	def touch(self, code):
+		entry = self.data.parts.get(code)
+		if entry is not None:
+			entry.used = time.time()
+			self.dirty = True
+
+	def query(self, key):
+		# Parts returned by an earlier search for this key, None if unknown
+		entry = self.data.queries.get(key)
+		if entry is None:
+			return None
+		return [self.data.parts[c].part for c in entry.codes]
+
+	def store_query(self, key, parts):
+		self.data.queries[key] = QueryEntry(time.time(), [p.code for p in parts])
+		self.dirty = True
+
+	def part(self, code):
+		return self.data.parts[code].part
+
+	def match(self, key):
+		# Code picked by an earlier identical lookup, '' if it found nothing, None if unknown
+		entry = self.data.matches.get(key)
+		if entry is None:
+			return None
+		return entry.code
+
+	def store_match(self, key, code):
+		entry = self.data.matches.get(key)
+		if entry is None or entry.code != code:
+			self.data.matches[key] = MatchEntry(time.time(), code)
+			self.dirty = True
+
+	def flush(self):
+		if not self.dirty:
+			return
+		if len(self.data.parts) > self.max_parts:
+			recent = sorted(self.data.parts.items(), key=lambda x: x[1].used, reverse=True)[:self.max_parts]
+			keep = set(code for code, e in recent)
+			self.data.parts = {code: e for code, e in self.data.parts.items() if code in keep}
+			self._drop_orphan_queries()
+		tmp_path = self.path + '.tmp'
+		with open(tmp_path, 'wb') as raw:
+			with gzip.open(raw, 'w') as f:
+				f.write(msgspec.msgpack.encode(self.data))
+			raw.flush()
+			os.fsync(raw.fileno())
+		os.replace(tmp_path, self.path)
+		self.dirty = False
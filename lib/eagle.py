@@ -4,21 +4,78 @@
 import xml.etree.ElementTree as ET
 import re
 
+from .rules import IGNORED_VALUE_RE, Rule, normalize, resistor_value
+
+
+_SOT_RE = re.compile(r'SOT\d{2,3}', re.M)
+
+
+def _strip_prefix(package, match):
+	return package[1:]
+
+
+def _sot_package(package, match):
+	if _SOT_RE.search(package):
+		package = package.replace('SOT', 'SOT-')
+	return package
+
+
+# The only field is the upper case package name
+PACKAGE_RULES = [
+	Rule('package', re.compile(r'^C\d{4,5}', re.M), _strip_prefix, 'CAPACITOR'),
+	Rule('package', re.compile(r'^R\d{4,5}', re.M), _strip_prefix, 'RESISTOR', resistor_value),
+	Rule('package', re.compile(r'^L\d{4,5}', re.M), _strip_prefix, 'INDUCTOR'),
+	Rule('package', re.compile(r'^SOT-?\d{2,3}(-\d)?$', re.M), _sot_package),
+	Rule('package', re.compile(r'^(DO-?\d{3}.+|SM[ABC])$', re.M), None, 'DIODE'),
+]
+# Used when no rule above matches: short packages are kept, longer ones are too specific to search for
+FALLBACK_RULES = [
+	Rule('package', re.compile(r'\A.{0,7}\Z', re.S)),
+	Rule('package', re.compile(''), lambda package, match: ''),
+]
+
+
 def get_components(path, layer, ignore=None):
 
 	if layer not in ('top', 'bottom'):
 		print('Unknown layer:', layer)
 		exit(1)
 
-	compos = {}
+	return get_components_by_layer(path, ignore)[layer]
+
+
+def _iter_elements(path, layers):
+	# Stream the board and drop every node once it has been read, so only the
+	# element being looked at is held in memory, however much copper there is
+	parents = []
+	in_element = 0
+	for event, node in ET.iterparse(path, events=('start', 'end')):
+		if event == 'start':
+			parents.append(node)
+			if node.tag == 'element':
+				in_element += 1
+			continue
+		parents.pop()
+		if node.tag == 'element':
+			in_element -= 1
+			yield node
+		elif node.tag == 'layer':
+			layers[node.attrib['number']] = node.attrib['name']
+		elif in_element:
+			continue  # Attributes are looked up once the whole element has been read
+		if parents:
+			parents[-1].remove(node)
+
+
+def get_components_by_layer(path, ignore=None):
+
+	by_layer = {'top': {}, 'bottom': {}}
 	layers = {}
-	board = ET.parse('{}'.format(path))
-	
-	for l in board.iter('layer'):
-		layers[l.attrib['number']] = l.attrib['name']
 
 	ignored_parts = []
-	for component in board.iter('element'):
+	ignore_re = re.compile(ignore) if ignore else None
+	memo = {}
+	for component in _iter_elements(path, layers):
 		value = component.attrib['value'].strip().upper()
 		name = component.attrib['name'].strip().upper()
 		package = component.attrib['package'].strip().upper()
@@ -33,41 +90,18 @@ def get_components(path, layer, ignore=None):
 		if rot_prop != None:
 			rot_offset = int(rot_prop.attrib.get('value', '').strip())
 
-		if (not lcsc_pn and ignore and re.match(ignore, name)) or re.match('^N[CBP]$', value):
+		if (not lcsc_pn and ignore_re and ignore_re.match(name)) or IGNORED_VALUE_RE.match(value):
 			ignored_parts.append(name)
 			continue
 		pos = (component.attrib['x'], component.attrib['y'])
 		cpn_layer = 'top'
 
-		# Trim R/C/L
-		if re.search(r'^C\d{4,5}', package, re.M):
-			package = package[1:]
-			desc = 'CAPACITOR'
-		elif re.search(r'^R\d{4,5}', package, re.M):
-			package = package[1:]
-			desc = 'RESISTOR'
-			if re.search(r'\d+R(\s\d%|$)', value, re.M):
-				value = value.replace('R', 'Ω')
-			elif re.search(r'\d+R\d+', value, re.M):
-				value = value.replace('R', '.')
-			if not value.endswith('Ω') and not value.endswith('%'):
-					value += 'Ω'
-		elif re.search(r'^L\d{4,5}', package, re.M):
-			package = package[1:]
-			desc = 'INDUCTOR'
-		elif re.search(r'^SOT-?\d{2,3}(-\d)?$', package, re.M):
-			if re.search(r'SOT\d{2,3}', package, re.M):
-				package = package.replace('SOT', 'SOT-')
-		elif re.search(r'^(DO-?\d{3}.+|SM[ABC])$', package, re.M):
-			desc = 'DIODE'
-		elif len(package) < 8:
-			pass
-		else:
-			package = ''  # Ignore most packages as they are too specific, see below
-			m = re.search(r'^.*LED.*\d{4,5}', package, re.M)
-			if m:
-				package = m.group(1)
-				desc = 'LED'
+		# Trim R/C/L, packages repeat so each combination is only normalized once
+		key = (package, value)
+		normalized = memo.get(key)
+		if normalized is None:
+			normalized = memo[key] = normalize({'package': package}, package, value, PACKAGE_RULES, FALLBACK_RULES)
+		package, value, desc = normalized
 
 		index = (value, package, lcsc_pn)
 
@@ -81,14 +115,14 @@ def get_components(path, layer, ignore=None):
 		rot = int(rot) + 180 + rot_offset
 		rot %= 360
 
-		if cpn_layer != layer:
-			continue
-
+		compos = by_layer[cpn_layer]
 		if index not in compos:
-			compos[index] = {'parts': [], 'jlc':
+			compos[index] = {'parts': [], 'type': desc, 'jlc':
 							 {'desc': '', 'basic': False, 'code': '', 'package': '', 'partName': ''}}
+		elif compos[index]['type'] != desc:
+			compos[index]['type'] = ''  # Parts of different types on one line, their value says nothing more
 		compos[index]['parts'].append((name, cpn_layer, pos, rot))
 
 	print('Ignored parts:', sorted(ignored_parts))
 
-	return compos
+	return by_layer
@@ -0,0 +1,73 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+import requests
+import threading
+import time
+
+from .instrument import count, span
+
+
+class TokenBucket:
+
+	def __init__(self, rate, burst=None):
+		self.rate = rate
+		self.capacity = burst or max(1.0, rate)
+		self.tokens = self.capacity
+		self.stamp = time.monotonic()
+		self.lock = threading.Lock()
+
+	def take(self):
+		if not self.rate:
+			return
+		with self.lock:
+			now = time.monotonic()
+			self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+			self.stamp = now
+			# Reserve the token now and sleep outside the lock if we went into debt
+			self.tokens -= 1
+			wait = -self.tokens / self.rate if self.tokens < 0 else 0
+		if wait:
+			time.sleep(wait)
+
+
+class Client:
+	# Thread-safe API client: one pooled session per thread, shared rate limit,
+	# retries with exponential backoff on connection errors and 429/5xx replies
+
+	def __init__(self, api, jobs=8, rate=10.0, retries=3, backoff=0.5, timeout=30):
+		self.api = api
+		self.jobs = max(1, jobs)
+		self.bucket = TokenBucket(rate)
+		self.retries = retries
+		self.backoff = backoff
+		self.timeout = timeout
+		self._local = threading.local()
+
+	def session(self):
+		session = getattr(self._local, 'session', None)
+		if session is None:
+			session = self._local.session = requests.Session()
+			adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.jobs)
+			session.mount('http://', adapter)
+			session.mount('https://', adapter)
+		return session
+
+	def post(self, payload, headers=None):
+		r = None
+		for attempt in range(self.retries + 1):
+			if attempt:
+				count('api.retries')
+				time.sleep(self.backoff * 2 ** (attempt - 1))
+			self.bucket.take()
+			count('api.requests')
+			try:
+				with span('api'):
+					r = self.session().post(self.api, json=payload, headers=headers, timeout=self.timeout)
+			except requests.RequestException as e:
+				count('api.errors')
+				print(' Request error:', e)
+				continue
+			if r.status_code != 429 and r.status_code < 500:
+				break
+		return r
@@ -0,0 +1,84 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+from contextlib import contextmanager
+import msgspec
+import threading
+import time
+
+
+class Recorder:
+	# Time spent in each stage of a run and counts of what happened in them. Spans
+	# nest per thread, a span started in another is named after both, like 'parse/from_sexpr'.
+
+	def __init__(self):
+		self.spans = {}  # Name: [calls, seconds]
+		self.counters = Counter()
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	@contextmanager
+	def span(self, name):
+		parent = getattr(self._local, 'name', None)
+		self._local.name = name = name if parent is None else parent + '/' + name
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add(name, time.perf_counter() - start)
+			self._local.name = parent
+
+	def add(self, name, seconds, calls=1):
+		with self._lock:
+			total = self.spans.setdefault(name, [0, 0.0])
+			total[0] += calls
+			total[1] += seconds
+
+	def count(self, name, n=1):
+		with self._lock:
+			self.counters[name] += n
+
+	def merge(self, report):
+		# Add what another recorder saw, such as the one of a worker process
+		for name, span in report['spans'].items():
+			self.add(name, span['seconds'], span['calls'])
+		for name, n in report['counters'].items():
+			self.count(name, n)
+
+	def report(self):
+		with self._lock:
+			return {'spans': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in sorted(self.spans.items())},
+					'counters': dict(sorted(self.counters.items()))}
+
+
+recorder = Recorder()  # What span() and count() record to
+
+
+def span(name):
+	"""Context manager adding the time spent in the block to the span name"""
+	return recorder.span(name)
+
+
+def count(name, n=1):
+	recorder.count(name, n)
+
+
+@contextmanager
+def recording():
+	"""Record to a new Recorder inside the block, which is returned"""
+	global recorder
+	previous = recorder
+	recorder = Recorder()
+	try:
+		yield recorder
+	finally:
+		recorder = previous
+
+
+def write_report(path, **info):
+	"""Write the spans and counters recorded so far to path as JSON, after the given fields"""
+	report = dict(info)
+	report.update(recorder.report())
+	with open(path, 'wb') as f:
+		f.write(msgspec.json.format(msgspec.json.encode(report), indent=2))
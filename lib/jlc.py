@@ -1,231 +1,468 @@
 #!/bin/env python3
 # -*- coding: utf-8 -*-
 
-import xlsxwriter
-import requests
+from collections import Counter
 import msgspec
-import time
 import gzip
 import os
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .cache import CACHE_MAX_PARTS, CACHE_TTL, PartCache, match_key, query_key
+from .fetch import Client
+from .instrument import count, span
+from .match import rank
+from .values import PART_KINDS, parse_value
+from .partdb import DB_VERSION, Part, PartDB, PartIndex, is_db_file, write_db
+from .sqlitedb import SqlitePartDB, write_sqlite
+from .writers import WRITERS, open_writer
 
 
 DB_FILE = 'jlcdb.db'
-CACHE_FILE = 'cache.db'
+SQLITE_FILE = 'jlcdb.sqlite'
+# Database file, writer and reader of each storage backend
+DB_BACKENDS = {'file': (DB_FILE, write_db, PartDB), 'sqlite': (SQLITE_FILE, write_sqlite, SqlitePartDB)}
 API = 'https://jlcpcb.com/api/overseas-pcb-order/v1/shoppingCart/smtGood/selectSmtComponentList/v2'
+PAGE_SIZE = 100
+DB_TTL = 7 * 24 * 3600  # Seconds before an unchanged subcategory is downloaded again
+
+
+# API response schema, only the fields we use are decoded
+class Price(msgspec.Struct, rename='camel', gc=False):
+	start_number: Optional[int] = 0
+	product_price: Optional[float] = None
+
+
+class Component(msgspec.Struct, rename='camel', gc=False):
+	component_code: str
+	describe: Optional[str] = None
+	component_model_en: Optional[str] = None
+	component_specification_en: Optional[str] = None
+	component_library_type: Optional[str] = None
+	stock_count: Optional[int] = None
+	component_prices: Optional[List[Price]] = None
+
+	def to_part(self, category=''):
+		prices = [p for p in self.component_prices or () if p.product_price is not None]
+		if not prices:
+			return None
+		price = min(prices, key=lambda x: x.start_number or 0)
+		return Part(self.component_code, self.describe or '', self.component_model_en or '',
+					self.component_specification_en or '', self.component_library_type == 'base',
+					self.stock_count or 0, price.product_price, category)
+
+
+class PageInfo(msgspec.Struct, gc=False):
+	total: Optional[int] = None
+	parts: Optional[List[Component]] = msgspec.field(default=None, name='list')
+
 
+class Category(msgspec.Struct, rename='camel', gc=False):
+	sort_name: str = ''
+	component_count: Optional[int] = None
+	child_sort_list: Optional[List['Category']] = None
+
+
+class ResponseData(msgspec.Struct, rename='camel', gc=False):
+	component_page_info: Optional[PageInfo] = None
+	sort_and_count_vo_list: Optional[List[Category]] = None
+
+
+class Response(msgspec.Struct, gc=False):
+	data: Optional[ResponseData] = None
+
+
+response_decoder = msgspec.json.Decoder(Response)
+
+
+def _fetch_page(client, name, page):
+	r = client.post({'currentPage': page, 'pageSize': PAGE_SIZE, 'searchSource': 'search', 'firstSortName': '', 'secondeSortName': name})
+	if r is None or r.status_code != 200:
+		print('- {}: request failed for page {}'.format(name, page))
+		return None
+	try:
+		return response_decoder.decode(r.content).data.component_page_info
+	except Exception as e:
+		print(e)
+		print(r.text)
+		return None
+
+
+def _collect_pages(client, name, pages):
+	# Apply the serial paging rules to pages fetched in any order: stop at the first
+	# failed, empty or short page, and keep going page by page if they were all full
+	data = []
+	page = 0
+	while True:
+		info = pages[page] if page in pages else _fetch_page(client, name, page)
+		if info is None:
+			return data, False
+		if not info.parts:
+			break
+		for component in info.parts:
+			part = component.to_part(name)
+			if part is None:
+				continue
+			data.append(part)
+		if len(info.parts) < PAGE_SIZE:
+			break
+		page += 1
+	return data, True
 
-def update_db():
+
+def _load_previous(backend='file'):
+	# Existing database to refresh, None if it is missing or predates incremental updates
+	path, writer, reader = DB_BACKENDS[backend]
+	try:
+		database = reader(path)
+	except (OSError, ValueError):
+		return None
+	if 'subcategories' not in database.meta:
+		database.close()
+		return None
+	return database
+
+
+def update_db(jobs=8, rate=10.0, api=None, incremental=False, ttl=DB_TTL, backend='file'):
 	print('Downloading components list...')
 	database = dict()
 	tmp_db = []
+	now = time.time()
+	state = {}  # Component count and fetch time of each subcategory
+	previous = {}  # Parts of the existing database, by subcategory
 
-	step = 100
-	r = requests.post(API, json={"searchType": 1, "pageSize": 0})
-	if r.status_code == 200:
-		categories = msgspec.json.decode(r.text)
-		for category in categories['data']['sortAndCountVoList']:
-			cat_data = []
-			print('Importing', category['sortName'])
-			for subcategory in category['childSortList']:
-				# Download a list of all components
-				subCategoryName = subcategory['sortName']
-				print('- {}... '.format(subCategoryName), end='', flush=True)
-				page = 0
-				subcat_data = []
-				while True:
-					r = requests.post(API, json={'currentPage': page, 'pageSize': step, 'searchSource': 'search', 'firstSortName': '', 'secondeSortName': subCategoryName})
-					if r.status_code == 200:
-						try:
-							data = msgspec.json.decode(r.text)['data']['componentPageInfo']['list']
-							data_len = len(data)
-							if data_len:
-								for part in data:
-									if not len(part['componentPrices']):
-										continue
-									part['componentPrices'] = sorted(part['componentPrices'], key=lambda x: x['startNumber'])
-									subcat_data.append(part)
-								if data_len < step:
-									break
-								page += 1
-								time.sleep(0.1)
-							else:
-								break
-						except Exception as e:
-							print(e)
-							print(r.text)
-							break
-				print(len(subcat_data))
-				cat_data += subcat_data
-			print('Total', len(cat_data), '\n\r')
-			tmp_db += sorted(cat_data, key=lambda x: x['componentPrices'][0]['productPrice'])
-	else:
+	client = Client(api or API, jobs=jobs, rate=rate)
+	r = client.post({"searchType": 1, "pageSize": 0})
+	if r is None or r.status_code != 200:
 		print('Update failed')
 		return
-	
+	try:
+		categories = response_decoder.decode(r.content).data.sort_and_count_vo_list
+	except Exception as e:
+		print(e)
+		print(r.text)
+		categories = None
+	if not categories:  # An empty list would replace the database with nothing
+		print('Update failed')
+		return
+	counts = {s.sort_name: s.component_count for c in categories for s in c.child_sort_list or []}
+	names = list(counts)
+
+	old_db = _load_previous(backend) if incremental else None
+	if old_db is not None:
+		# Only download subcategories whose size changed or that are too old
+		old_state = old_db.meta['subcategories']
+		for part in old_db.parts_of(range(len(old_db))):
+			previous.setdefault(part.category, []).append(part)
+		old_db.close()
+		for name, count in counts.items():
+			if name in old_state and old_state[name]['count'] == count and now - old_state[name]['fetched'] < ttl:
+				state[name] = old_state[name]
+		names = [name for name in counts if name not in state]
+		print('{} of {} subcategories changed or expired'.format(len(names), len(counts)))
+	elif incremental:
+		print('No database to update, downloading everything')
+
+	print('Fetching {} subcategories with {} workers...'.format(len(names), jobs))
+
+	with span('fetch'), ThreadPoolExecutor(jobs) as pool:
+		# The first page of each subcategory tells how many pages to request next
+		first = dict(zip(names, pool.map(lambda name: _fetch_page(client, name, 0), names)))
+		futures = {}
+		for name, info in first.items():
+			if info is not None and info.total:
+				for page in range(1, -(-info.total // PAGE_SIZE) + 1):
+					futures[name, page] = pool.submit(_fetch_page, client, name, page)
+		pages = {name: {0: info} for name, info in first.items()}
+		for (name, page), future in futures.items():
+			pages[name][page] = future.result()
+
+	subcats = {}
+	for name in counts:
+		if name in pages:
+			subcats[name], complete = _collect_pages(client, name, pages[name])
+			if complete:
+				state[name] = {'count': counts[name], 'fetched': now}
+			elif name in previous:  # Keep what we had rather than a partial download
+				subcats[name] = previous[name]
+		else:
+			subcats[name] = previous.get(name, [])
+
+	for category in categories:
+		cat_data = []
+		print('Importing', category.sort_name)
+		for subcategory in category.child_sort_list or []:
+			subcat_data = subcats[subcategory.sort_name]
+			print('- {}... {}{}'.format(subcategory.sort_name, len(subcat_data), '' if subcategory.sort_name in pages else ' (unchanged)'))
+			cat_data += subcat_data
+		print('Total', len(cat_data), '\n\r')
+		tmp_db += sorted(cat_data, key=lambda x: x.price)
+
 	for i in tmp_db:
-		database[i['componentCode']] = i
+		database[i.code] = i
 
-	with gzip.open(DB_FILE, 'w') as f:
-		f.write(msgspec.msgpack.encode(database))
+	# Build the search index once here instead of on every lookup
+	path, writer, reader = DB_BACKENDS[backend]
+	with span('write'):
+		writer(path, PartIndex(database.values()), meta={'subcategories': state})
 
 
-def load_db():
-	if not os.path.exists(DB_FILE):
+def load_db(backend='file'):
+	path, writer, reader = DB_BACKENDS[backend]
+	if not os.path.exists(path):
 		print('Database not found, ignoring')
 		return {}
-	with gzip.open(DB_FILE, 'r') as f:
-		database = msgspec.msgpack.decode(f.read())
+	if backend == 'sqlite':
+		try:
+			database = reader(path)
+		except ValueError as e:
+			print(e, ', please update it', sep='')
+			return {}
 		print('loaded {0} components from database'.format(len(database)))
+		return database
+	if not is_db_file(DB_FILE):  # Database from an older version, convert it once
+		print('Converting database to the new format...')
+		with gzip.open(DB_FILE, 'r') as f:
+			data = msgspec.msgpack.decode(f.read())
+		components = msgspec.convert(data['parts'] if 'words' in data else list(data.values()), List[Component])
+		write_db(DB_FILE, PartIndex(p for p in (c.to_part() for c in components) if p is not None))
+	try:
+		database = PartDB(DB_FILE)
+	except ValueError as e:
+		print(e, ', please update it', sep='')
+		return {}
+	if database.version < DB_VERSION:  # Add what newer versions precompute, the parts are kept
+		print('Converting database to the new format...')
+		parts = [database.part(row) for row in range(len(database))]
+		meta = {k: v for k, v in database.meta.items() if k == 'subcategories'}
+		database.close()
+		write_db(DB_FILE, PartIndex(parts), meta=meta)
+		database = PartDB(DB_FILE)
+	print('loaded {0} components from database'.format(len(database)))
 	return database
 
 
-def search(compos:dict, database:bool = None, use_cache:bool = False, nostock:bool = False, strict:bool = False, basic:bool = False, limit:int = 1):
+def _result(entry=None):
+	if entry is None:
+		return {'code': '', 'desc': '', 'basic': False, 'package': '', 'partName': '', 'unitPrice': 0.0}
+	return {'code': entry.code, 'desc': entry.describe, 'basic': entry.basic, 'package': entry.package,
+			'partName': entry.model, 'unitPrice': entry.price}
+
+
+def _search_online(client, keyword, nostock, basic, limit):
+	tmp_parts = []
+	page = 1
+	while True:
+		post_data = {'keyword': keyword,
+					'firstSortName': '',
+					'secondeSortName': '',
+					'currentPage': page, 
+					'pageSize': 100,
+					'searchSource': 'search',
+					'stockFlag': not nostock,
+					'componentLibraryType': 'base' if basic else '',
+					'stockSort': 'true'}
+		r = client.post(post_data, headers={'content-type': 'application/json', 'referer': 'https://jlcpcb.com/parts/basic_parts'})
+		if r is None or r.status_code != 200:
+			print(' Request failed for {}:'.format(keyword), r.status_code if r is not None else 'no response')
+			return sorted(tmp_parts, key=lambda x: x.price), False
+		r_data = []
+		try:
+			json_data = response_decoder.decode(r.content).data
+		except (msgspec.ValidationError, msgspec.DecodeError) as e:
+			print(' Bad reply for {}:'.format(keyword), e)
+			return sorted(tmp_parts, key=lambda x: x.price), False
+		if json_data is None or json_data.component_page_info is None:
+			break
+		for component in json_data.component_page_info.parts or ():
+			part = component.to_part()
+			if part is None:
+				continue
+			r_data.append(part)
+		tmp_parts += r_data
+		# Loop if page is full
+		if len(r_data) < 100 or page >= limit:
+			break
+		page += 1
+	# Sort by unit price
+	return sorted(tmp_parts, key=lambda x: x.price), True
+
+
+def search(compos:dict, database:bool = None, use_cache:bool = False, nostock:bool = False, strict:bool = False, basic:bool = False, limit:int = 1, jobs:int = 8, rate:float = 10.0, api:str = None,
+		   cache_ttl:float = CACHE_TTL, cache_size:int = CACHE_MAX_PARTS, cache:PartCache = None,
+		   on_line=None, matches:int = 1):
 	missing = list()
 	bom = list()
 	parts = dict()
-	cache = dict()
+	stats = Counter()  # Candidates seen by _verify and how many each check removed
 
-	def _verify(lcscpn, parts, names, value, package, nostock, strict):
-		v = {'code': '', 'desc': '', 'basic': False, 'package': '', 'partName': '', 'unitPrice': 0.0}
+	def _verify(lcscpn, parts, names, value, package, part_type, nostock, strict):
+		v = _result()
 		if lcscpn in parts:
-				v['code'] = lcscpn
-				v['desc'] = parts[lcscpn]['describe']
-				v['basic'] = parts[lcscpn]['componentLibraryType'] == 'base'
-				v['package'] = parts[lcscpn]['componentSpecificationEn']
-				v['partName'] = parts[lcscpn]['componentModelEn']
-				v['unitPrice'] = parts[lcscpn]['componentPrices'][0]['productPrice']
-				return v
+				return _result(parts[lcscpn])
 
 		# Skip the rest if we are in strict matching mode or already found it using part code
 		if not strict:
-			for k, entry in parts.items():
-				desc = entry['describe'].upper().split(' ')
-				reference = entry['componentModelEn'].upper()
-
-				# Fix missing ohms symbol
-				if 'RESISTOR' in desc or 'RESISTORS' in desc:
-					for i in range(len(desc)):
-						# Add/fix ohm symbol to part description if present in component value
-						if 'Ω' in value or 'OHM' in value.upper():
-							desc[i] = desc[i].upper().replace('OHMS', 'Ω')
-						else: # Strip ohm symbol from part description if missing from component value
-							desc[i] = desc[i].upper().replace('OHMS', '').replace('Ω', '')
-						if re.match('±\d%$', desc[i], re.M):
-							desc[i] = desc[i][1:]
-
-				# Ignore if the required quantity isn't available
-				if entry['stockCount'] < len(names) and nostock == False:
-					continue
-				if package and package not in entry['describe'] and package != entry['componentSpecificationEn'].upper():
-					continue
-				all_words_found = True
-				# Check all words are found in description
-				for word in value.strip().split(' '):
-					if word.upper() not in desc:
-						all_words_found = False
-						break
-				# Check part reference if not found with description (used for ICs most of the time)
-				if not all_words_found and value not in reference:
-					continue
-
-				v['desc'] = entry['describe']
-				v['code'] = entry['componentCode']
-				v['basic'] = entry['componentLibraryType'] == 'base'
-				v['package'] = entry['componentSpecificationEn']
-				v['partName'] = entry['componentModelEn']
-				v['unitPrice'] = entry['componentPrices'][0]['productPrice']
-				if v['basic']:  # We have found a matching "basic" part, skip the rest
-					break
-
-			return v
+			# Passives are looked up by value and package in the numeric index, the others by text,
+			# and so are passives whose value is of another kind than the part type, like 10UH on a capacitor.
+			# Cheap checks first, only resistors matched by description words need their words compared.
+			# Every match is then scored, see match.rank.
+			kind = PART_KINDS.get(part_type)
+			passive = parse_value(value, upper=True, kind=kind) if kind and package else None
+			numeric = parts.passive_rows(passive, package) if passive and passive.kind == kind else None
+			if numeric:
+				stats['numeric'] += 1
+				words, models = numeric, set()
+			else:
+				words = parts.word_rows(value)
+				models = parts.model_rows(value)
+			resistors = parts.resistor_rows()
+			# Descriptions keep their ohm symbols if the component value has one
+			ohm = 'Ω' in value or 'OHM' in value.upper()
+			value_words = set(word.upper() for word in value.strip().split(' '))
+			rows = sorted(words | models)
+			stats['candidates'] += len(rows)
+
+			# Ignore if the required quantity isn't available or the package is wrong
+			rows, no_stock, no_package = parts.filter_rows(rows, 0 if nostock else len(names), package)
+			stats['stock'] += no_stock
+			stats['package'] += no_package
+
+			matched = []
+			for row in rows:
+				# Rows found from the model (used for ICs most of the time) or from the words of
+				# a description that is not a resistor's hold the value as is
+				if not numeric and row not in models and row in resistors:
+					stats['normalized'] += 1
+					# Description words with the ohm symbol fixed are computed once with the database
+					if not value_words.issubset(parts.desc_tokens(row, ohm)):
+						stats['description'] += 1
+						continue
+				matched.append(row)
+
+			# Best scored matches first, the first one is used
+			ranked = rank(parts, matched, words, models, value_words, len(names), package, matches)
+			if ranked:
+				v = _result(parts.part(ranked[0][1]))
+				v['score'] = ranked[0][0]
+				v['matches'] = [(parts.part(row).code, score) for score, row in ranked]
+
+		return v
 		
-	try:
-		with gzip.open(CACHE_FILE, 'r') as f:
-			cache = msgspec.msgpack.decode(f.read())
-		print('loaded {0} components from cache'.format(len(cache)))
-	except (FileNotFoundError, msgspec.DecodeError):
-		print('No cache found')
+	# A cache passed in is shared between several searches and flushed by the caller
+	own_cache = cache is None
+	if own_cache:
+		cache = PartCache(ttl=cache_ttl, max_parts=cache_size)
+		if use_cache:
+			cache.load()
+	else:
+		use_cache = True
 
+	lines = []
 	for c, v in compos.items():
-		value = c[0]
-		package = c[1]
-		lcscpn = c[2]
-		names = []
-		reload_cache = False
-
-		for n in v['parts']:
-			names.append(n[0])
-
-		if not database:
-			if lcscpn:
-				keyword = lcscpn
-			else:
-				keyword = '{} '.format(value)
-				if package:
-					keyword += '{} '.format(package)
-			keyword = keyword.strip()
-
+		value, package, lcscpn = c
+		part_type = v.get('type', '')
+		names = [n[0] for n in v['parts']]
+		if lcscpn:
+			keyword = lcscpn
+		else:
+			keyword = '{} '.format(value)
+			if package:
+				keyword += '{} '.format(package)
+		lines.append((c, v, names, value, package, part_type, lcscpn, keyword.strip()))
+
+	results = dict()
+	verified = dict()  # Lines matched against the cached parts below, reused until new parts are cached
+	if not database:
+		# Run every online lookup the cache can't answer at once, results are used in BOM order below
+		client = Client(api or API, jobs=jobs, rate=rate)
+		keywords = []
+		for c, v, names, value, package, part_type, lcscpn, keyword in lines:
 			if not keyword:
 				continue
-			
-			print('Searching {} ({} parts)...'.format(keyword, len(names)), end='', flush=True)
-
 			if use_cache:
-				v['jlc'] = _verify(lcscpn, cache, names, value, package, nostock, strict)
-				if v['jlc']['code']:
-					print('Found {} from cache'.format(v['jlc']['code']))
-				else:
-					print('Searching online...', end='', flush=True)
-					tmp_parts = []
-					page = 1
-					while True:
-						print('.', end="", flush=True)
-						post_data = {'keyword': keyword,
-									'firstSortName': '',
-									'secondeSortName': '',
-									'currentPage': page, 
-									'pageSize': 100,
-									'searchSource': 'search',
-									'stockFlag': not nostock,
-									'componentLibraryType': 'base' if basic else '',
-									'stockSort': 'true'}
-						r = requests.post(API, json=post_data, headers={'content-type': 'application/json', 'referer': 'https://jlcpcb.com/parts/basic_parts'})
-						if r.status_code != 200:
-							print(' Request failed:', r.status_code)
-							break
-						r_data = []
-						json_data = msgspec.json.decode(r.text)['data']
-						try:
-							for part in json_data['componentPageInfo']['list']:
-								if not len(part['componentPrices']):
-									continue
-								part['componentPrices'] = sorted(part['componentPrices'], key=lambda x: x['startNumber'])
-								r_data.append(part)
-						except (TypeError, KeyError):
-							break
-						tmp_parts += r_data
-						# Loop if page is full
-						if len(r_data) < 100 or page >= limit:
-							break
-						page += 1
-					if tmp_parts:
-						# Sort by unit price
-						tmp_parts = sorted(tmp_parts, key=lambda x: x['componentPrices'][0]['productPrice'])
-						parts = {p['componentCode']:p for p in tmp_parts}
-						cache = cache | parts
-						with gzip.open(CACHE_FILE, 'w+') as f:
-							f.write(msgspec.msgpack.encode(cache))
-						v['jlc'] = _verify(lcscpn, parts, names, value, package, nostock, strict)
-					print('', len(tmp_parts) or ' Not', 'found')
-		else:
-			print('Using offline database to search {} ({} parts)...'.format(keyword, len(names)))
-			v['jlc'] = _verify(lcscpn, database, names, value, package, nostock, strict)
+				if cache.match(match_key(keyword, value, package, part_type, lcscpn, strict, nostock, basic, limit, len(names))) is not None:
+					continue
+				verified[c] = _verify(lcscpn, cache.index, names, value, package, part_type, nostock, strict)
+				if verified[c]['code'] or cache.query(query_key(keyword, nostock, basic, limit)) is not None:
+					continue
+			keywords.append(keyword)
+		keywords = list(dict.fromkeys(keywords))
+		with span('online'), ThreadPoolExecutor(jobs) as pool:
+			results = dict(zip(keywords, pool.map(lambda k: _search_online(client, k, nostock, basic, limit), keywords)))
 
-		if v['jlc']['code']:
-			bom.append((sorted(names), v['jlc']))
-		else:
-			missing.append((sorted(names), value, package))
+	try:
+		for c, v, names, value, package, part_type, lcscpn, keyword in lines:
+			if not database:
+				if not keyword:
+					if on_line:
+						on_line(c, v)
+					continue
+
+				print('Searching {} ({} parts)...'.format(keyword, len(names)), end='', flush=True)
+
+				match = match_key(keyword, value, package, part_type, lcscpn, strict, nostock, basic, limit, len(names))
+				code = cache.match(match) if use_cache else None
+				if code is not None:
+					# Same lookup was resolved recently, no need to search again
+					v['jlc'] = _result(cache.part(code)) if code else _result()
+					print('Found {} from cache'.format(code) if code else 'Not found (cached)')
+					cache.touch(code)
+					count('cache.hits')
+				else:
+					if use_cache:
+						v['jlc'] = verified.pop(c, None) or _verify(lcscpn, cache.index, names, value, package, part_type, nostock, strict)
+					key = query_key(keyword, nostock, basic, limit)
+					complete = True
+					tmp_parts = cache.query(key) if use_cache else None
+					if use_cache and v['jlc']['code']:
+						print('Found {} from cache'.format(v['jlc']['code']))
+						cache.touch(v['jlc']['code'])
+						count('cache.hits')
+					elif tmp_parts is not None:
+						# Same search was done recently, including searches that found nothing
+						print('Using cached search...', end='', flush=True)
+						count('cache.hits')
+						if tmp_parts:
+							v['jlc'] = _verify(lcscpn, PartIndex(tmp_parts), names, value, package, part_type, nostock, strict)
+							cache.touch(v['jlc']['code'])
+						print('', len(tmp_parts) or ' Not', 'found')
+					else:
+						print('Searching online...', end='', flush=True)
+						if use_cache:
+							count('cache.misses')
+						tmp_parts, complete = results[keyword] if keyword in results else _search_online(client, keyword, nostock, basic, limit)
+						if tmp_parts:
+							parts = {p.code:p for p in tmp_parts}
+							if use_cache:
+								cache.update(parts)
+								verified.clear()
+							v['jlc'] = _verify(lcscpn, PartIndex(parts.values()), names, value, package, part_type, nostock, strict)
+						if use_cache and complete:
+							cache.store_query(key, tmp_parts)
+						print('', len(tmp_parts) or ' Not', 'found')
+					if use_cache and complete:
+						cache.store_match(match, v['jlc']['code'])
+			else:
+				print('Using offline database to search {} ({} parts)...'.format(keyword, len(names)))
+				with span('verify'):
+					v['jlc'] = _verify(lcscpn, database, names, value, package, part_type, nostock, strict)
+				if len(v['jlc'].get('matches', ())) > 1:
+					print(' Best matches:', ', '.join('{} ({:.2f})'.format(code, score) for code, score in v['jlc']['matches']))
+
+			if v['jlc']['code']:
+				# Lines answered by the match cache have no ranking, it is left out so reruns report the same
+				bom.append((sorted(names), {k: x for k, x in v['jlc'].items() if k not in ('score', 'matches')}))
+			else:
+				missing.append((sorted(names), value, package))
+			if on_line:
+				# Lines are resolved in order, output can be written while the next ones are searched
+				on_line(c, v)
+	finally:
+		# Save everything found online in one go, even if the run is interrupted
+		if own_cache:
+			cache.flush()
 
 	print('Found parts ({}):'.format(len(bom)))
 	for part in sorted(bom):
@@ -235,84 +472,78 @@ def search(compos:dict, database:bool = None, use_cache:bool = False, nostock:bo
 	for m in sorted(missing):
 		print(m)
 
+	for name, n in stats.items():
+		count('verify.' + name, n)
+	if stats['candidates']:
+		print('Candidates: {0[candidates]}, removed by stock: {0[stock]}, package: {0[package]}, description: {0[description]} '
+			  '({0[normalized]} normalized, {0[numeric]} lines found by value)'.format(stats))
+
 	return compos
 
 
-def make_bom(parts, path='bom.xlsx'):
-	workbook = xlsxwriter.Workbook(path)
-	bom = workbook.add_worksheet()
-	bom.set_column('A:A', 30)
-	bom.set_column('B:B', 50)
-	bom.set_column('C:C', 30)
-	bom.set_column('D:D', 30)
+BOM_HEADER = ('Comment', 'Designator', 'Footprint', 'LCSC Part #', 'Type')
+BOM_WIDTHS = ((0, 0, 30), (1, 1, 50), (2, 2, 30), (3, 3, 30))
+CPL_HEADER = ('Designator', 'Mid X', 'Mid Y', 'Layer', 'Rotation')
+CPL_WIDTHS = ((0, 4, 15),)
+OUTPUT_FORMATS = tuple(WRITERS)
 
-	bom.write('A1', 'Comment')
-	bom.write('B1', 'Designator')
-	bom.write('C1', 'Footprint')
-	bom.write('D1', 'LCSC Part #')
-	bom.write('E1', 'Type')
 
-	line = 2
-	for part, data in parts.items():
+def bom_row(part, data):
 
-		value = part[0]
-		package = part[1]
+	value = part[0]
+	package = part[1]
 
-		try:
-			reference = data['jlc']['code']
-		except KeyError:
-			reference = ''
+	try:
+		reference = data['jlc']['code']
+	except KeyError:
+		reference = ''
 
-		try:
-			basic = data['jlc']['basic']
-			if basic:
-				basic = 'base'
-			else:
-				basic = 'extended'
-		except KeyError:
-			basic = 'N/A'
+	try:
+		basic = data['jlc']['basic']
+		if basic:
+			basic = 'base'
+		else:
+			basic = 'extended'
+	except KeyError:
+		basic = 'N/A'
 
-		try:
-			package = data['jlc']['package']
-		except KeyError:
-			pass
+	try:
+		package = data['jlc']['package']
+	except KeyError:
+		pass
+
+	name_list = []
+	for n in sorted(data['parts'], key=lambda x: x[0]):
+		name_list.append(n[0])
 
-		name_list = []
-		for n in sorted(data['parts'], key=lambda x: x[0]):
-			name_list.append(n[0])
+	return (value, ','.join(name_list), package, reference, basic)
 
-		bom.write('A'+str(line), value)
-		bom.write('B'+str(line), ','.join(name_list))
-		bom.write('C'+str(line), package)
-		bom.write('D'+str(line), reference)
-		bom.write('E'+str(line), basic)
-		line += 1
 
-	workbook.close()
+def cpl_rows(part, data):
+	for n in sorted(data['parts'], key=lambda x: x[0]):
+
+		x = round(float(n[2][0]), 3)
+		y = round(float(n[2][1]), 3)
+
+		yield (n[0], '{:.3f}mm'.format(x), '{:.3f}mm'.format(y), n[1].lower(), n[3])
+
+
+def open_bom(path='bom.xlsx'):
+	return open_writer(path, BOM_HEADER, BOM_WIDTHS)
+
+
+def open_cpl(path='cpl.xlsx'):
+	return open_writer(path, CPL_HEADER, CPL_WIDTHS)
+
+
+def make_bom(parts, path='bom.xlsx'):
+	with open_bom(path) as bom:
+		for part, data in parts.items():
+			bom.write(bom_row(part, data))
+
 
 def make_cpl(parts, path='cpm.xlsx'):
-	workbook = xlsxwriter.Workbook(path)
-	cpl = workbook.add_worksheet()
-	cpl.set_column('A:E', 15)
-
-	cpl.write('A1', 'Designator')
-	cpl.write('B1', 'Mid X')
-	cpl.write('C1', 'Mid Y')
-	cpl.write('D1', 'Layer')
-	cpl.write('E1', 'Rotation')
-
-	line = 2
-	for part, data in parts.items():
-		for n in sorted(data['parts'], key=lambda x: x[0]):
-
-			x = round(float(n[2][0]), 3)
-			y = round(float(n[2][1]), 3)
-
-			cpl.write('A'+str(line), n[0])
-			cpl.write('B'+str(line), '{:.3f}mm'.format(x))
-			cpl.write('C'+str(line), '{:.3f}mm'.format(y))
-			cpl.write('D'+str(line), n[1].lower())
-			cpl.write('E'+str(line), n[3])
-			line += 1
-
-	workbook.close()
+	with open_cpl(path) as cpl:
+		for part, data in parts.items():
+			for row in cpl_rows(part, data):
+				cpl.write(row)
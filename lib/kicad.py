@@ -4,27 +4,86 @@
 import re
 import time
 from kiutils.board import Board
+from kiutils.utils import sexpr
+
+from .instrument import span
+
+from .rules import IGNORED_VALUE_RE, Rule, group_package, normalize, resistor_value, split_package
+
+LAYERS = {'F.Cu': 'top', 'B.Cu': 'bottom'}
+
+_INDUCTOR_SIZE_RE = re.compile(r'L_(\d{4})_\d+', re.M)
+_INDUCTOR_NAMED_RE = re.compile(r'L_(\w+)+-(\d{4})', re.M)
+_PACKAGE_RE = re.compile(r'(\w+-\d+)', re.M)
+_CRYSTAL_RE = re.compile(r'^Crystal.*(\d{4}|\d+\.?x\d+\.?\d+(mm)?)', re.M)
+
+
+def _inductor_package(package, match):
+	m = _INDUCTOR_SIZE_RE.search(package)
+	if m:
+		package = m.group(1)
+	m = _INDUCTOR_NAMED_RE.search(package)
+	if m:
+		package = m.group(2)
+	return package
+
+
+def _search_package(regex, group=1):
+	def package_of(package, match):
+		m = regex.search(package)
+		return m.group(group) if m else package
+	return package_of
 
-def get_components(path, layer, ignore=None):
 
-	pcb = Board().from_file(path)
+# Fields are the footprint library, its name (package) and the reference (name)
+PACKAGE_RULES = [
+	Rule('library', re.compile(r'^Capacitor', re.M), split_package, 'CAPACITOR'),
+	Rule('library', re.compile(r'^LED', re.M), split_package, 'LED'),
+	Rule('library', re.compile(r'^Resistor', re.M), split_package, 'RESISTOR', resistor_value),
+	Rule('library', re.compile(r'^Inductor', re.M), _inductor_package, 'INDUCTOR'),
+	Rule('library', re.compile(r'(Package_(TO|SO(N)?|BGA|DFN_QFN|QFP))', re.M), _search_package(_PACKAGE_RE)),
+	Rule('library', re.compile(r'Crystal', re.M), _search_package(_CRYSTAL_RE), 'CRYSTAL'),
+	Rule('name', re.compile(r'^D\d+', re.M), split_package, 'DIODE'),
+	Rule('name', re.compile(r'^FL\d+', re.M), split_package, 'FILTER'),
+]
+# Used when no rule above matches
+FALLBACK_RULES = [
+	Rule('package', re.compile(r'^(\w+-\d+)_', re.M), group_package),
+]
 
-	if layer == 'top':
-		kicad_layer = 'F.Cu'
-	elif layer == 'bottom':
-		kicad_layer = 'B.Cu'
-	else:
+
+def get_components(path, layer, ignore=None):
+
+	if layer not in ('top', 'bottom'):
 		print('Unknown layer:', layer)
 		exit(1)
 
-	compos = {}
+	return get_components_by_layer(path, ignore)[layer]
+
+
+def get_components_by_layer(path, ignore=None):
+
+	# Only footprints are used, tracks and zones are skipped while parsing
+	tokens = {'footprint'}
+	with span('parse_sexp'):
+		with open(path, 'r') as f:
+			tree = sexpr.parse_sexp(f, tokens)
+	with span('from_sexpr'):
+		pcb = Board.from_sexpr(tree, tokens)
+
+	by_layer = {'top': {}, 'bottom': {}}
 	ignored_parts = []
+	ignore_re = re.compile(ignore) if ignore else None
+	name_rules = [r for rules in (PACKAGE_RULES, FALLBACK_RULES) for r in rules if r.field == 'name']
+	memo = {}
 	for footprint in pcb.footprints:
 		# if not hasattr(footprint, 'property'): continue
 		value = ''
 		name = ''
+		layer = LAYERS.get(footprint.layer)
 
-		if footprint.layer == kicad_layer:
+		if layer:
+			compos = by_layer[layer]
 			library = footprint.libraryNickname
 			package = footprint.entryName
 			if layer == 'top':
@@ -49,65 +108,28 @@ def get_components(path, layer, ignore=None):
 			if layer == 'bottom':
 				rot = -rot
 
-			if (not lcsc_pn and ignore and re.match(ignore, name)) \
-			or re.match('^N[CBP]$', value) \
+			if (not lcsc_pn and ignore_re and ignore_re.match(name)) \
+			or IGNORED_VALUE_RE.match(value) \
 			or footprint.attributes.excludeFromBom or footprint.attributes.doNotPopulate:
 				ignored_parts.append(name)
 				continue
 
-			# Trim packages
-			if re.search(r'^Capacitor', library, re.M):
-				package = package.split('_')[1]
-				desc = 'CAPACITOR'
-			elif re.search(r'^LED', library, re.M):
-				package = package.split('_')[1]
-				desc = 'LED'
-			elif re.search(r'^Resistor', library, re.M):
-				package = package.split('_')[1]
-				desc = 'RESISTOR'
-				if re.search(r'\d+R(\s\d%|$)', value, re.M):
-					value = value.replace('R', 'Ω')
-				elif re.search(r'\d+R\d+', value, re.M):
-					value = value.replace('R', '.')
-				if not value.endswith('Ω') and not value.endswith('%'):
-					value += 'Ω'
-			elif re.search(r'^Inductor', library, re.M):
-				m = re.search(r'L_(\d{4})_\d+', package, re.M)
-				if m:
-					package = m.group(1)
-				m = re.search(r'L_(\w+)+-(\d{4})', package, re.M)
-				if m:
-					package = m.group(2)
-				desc = 'INDUCTOR'
-			elif re.search(r'(Package_(TO|SO(N)?|BGA|DFN_QFN|QFP))', library, re.M):
-				m = re.search(r'(\w+-\d+)', package, re.M)
-				if m:
-					package = m.group(1)
-			elif re.search(r'Crystal', library, re.M):
-				m = re.search(r'^Crystal.*(\d{4}|\d+\.?x\d+\.?\d+(mm)?)', package, re.M)
-				if m:
-					package = m.group(1)
-				else:
-					package = package
-				desc = 'CRYSTAL'
-
-			elif re.search(r'^D\d+', name, re.M):
-				package = package.split('_')[1]
-				desc = 'DIODE'
-			elif re.search(r'^FL\d+', name, re.M):
-				package = package.split('_')[1]
-				desc = 'FILTER'
-			else:
-				m = re.search(r'^(\w+-\d+)_', package, re.M)
-				if m:
-					package = m.group(1)
+			# Trim packages, footprints repeat so each combination is only normalized once
+			key = (library, package, value, tuple(bool(r.pattern.search(name)) for r in name_rules))
+			normalized = memo.get(key)
+			if normalized is None:
+				fields = {'library': library, 'package': package, 'name': name}
+				normalized = memo[key] = normalize(fields, package, value, PACKAGE_RULES, FALLBACK_RULES)
+			package, value, desc = normalized
 
 			if value and package:
 				index = (str(value), package, lcsc_pn)
 
 				if index not in compos:
-					compos[index] = {'parts': [], 'jlc':
+					compos[index] = {'parts': [], 'type': desc, 'jlc':
 									{'desc': '', 'basic': False, 'code': '', 'package': '', 'partName': ''}}
+				elif compos[index]['type'] != desc:
+					compos[index]['type'] = ''  # Parts of different types on one line, their value says nothing more
 				compos[index]['parts'].append((name, layer, pos, str(rot)))
 
-	return compos
+	return by_layer
@@ -0,0 +1,93 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import math
+
+from .partdb import numpy
+
+
+# Weight of each part of the match score, every part is between 0 and 1:
+# words: share of the value words found in the description
+# model: the value is part of the model
+# package: the package is the part's own, not only named in its description
+# basic: basic part, no extra fee
+# stock: stock over the required quantity, up to STOCK_MARGIN times
+# price: cheapest matching unit price over the part's
+SCORE_WEIGHTS = {'words': 2.0, 'model': 2.0, 'package': 2.0, 'basic': 4.0, 'stock': 1.0, 'price': 1.0}
+STOCK_MARGIN = 100
+PRICE_FLOOR = 0.0001  # Smallest unit price, free parts count as this
+
+
+def _word_share(parts, rows, words, value_words):
+	# Rows found from the description hold every word, the others are counted from the word index
+	share = [1.0 if row in words else 0.0 for row in rows]
+	partial = [i for i, row in enumerate(rows) if row not in words]
+	if partial and value_words:
+		found = [0] * len(partial)
+		for word in value_words:
+			postings = set(parts.postings(word) or ())
+			for j, i in enumerate(partial):
+				found[j] += rows[i] in postings
+		for j, i in enumerate(partial):
+			share[i] = found[j] / len(value_words)
+	return share
+
+
+def _rank_arrays(parts, arrays, rows, share, models, quantity, package, limit):
+	index = numpy.fromiter(rows, numpy.intp, len(rows))
+	price = numpy.maximum(arrays.price[index], PRICE_FLOOR)
+	score = SCORE_WEIGHTS['words'] * numpy.array(share)
+	score += SCORE_WEIGHTS['model'] * numpy.fromiter((row in models for row in rows), numpy.bool_, len(rows))
+	if package:
+		score += SCORE_WEIGHTS['package'] * (arrays.package[index] == parts.package_id(package))
+	score += SCORE_WEIGHTS['basic'] * arrays.basic[index]
+	margin = numpy.log1p(arrays.stock[index].clip(0) / quantity) / math.log1p(STOCK_MARGIN)
+	score += SCORE_WEIGHTS['stock'] * numpy.minimum(margin, 1.0)
+	score += SCORE_WEIGHTS['price'] * (price.min() / price)
+	if len(rows) > limit:
+		# Only the best limit scores are ordered, ties go to the first row
+		best = numpy.argpartition(-score, limit - 1)[:limit]
+		threshold = score[best].min()
+		best = numpy.flatnonzero(score >= threshold)
+	else:
+		best = numpy.arange(len(rows))
+	ranked = sorted(zip((-score[best]).tolist(), best.tolist()))[:limit]
+	return [(-s, rows[i]) for s, i in ranked]
+
+
+def _rank_rows(parts, rows, share, models, quantity, package, limit):
+	entries = parts.parts_of(rows)
+	cheapest = min(max(e.price, PRICE_FLOOR) for e in entries)
+
+	def scored():
+		for i, (row, entry) in enumerate(zip(rows, entries)):
+			score = SCORE_WEIGHTS['words'] * share[i]
+			score += SCORE_WEIGHTS['model'] * (row in models)
+			if package:
+				score += SCORE_WEIGHTS['package'] * (entry.package.upper() == package)
+			score += SCORE_WEIGHTS['basic'] * entry.basic
+			margin = math.log1p(max(entry.stock, 0) / quantity) / math.log1p(STOCK_MARGIN)
+			score += SCORE_WEIGHTS['stock'] * min(margin, 1.0)
+			score += SCORE_WEIGHTS['price'] * (cheapest / max(entry.price, PRICE_FLOOR))
+			yield score, -i
+
+	# Bounded heap, the candidates are never sorted as a whole
+	return [(score, rows[-i]) for score, i in heapq.nlargest(limit, scored())]
+
+
+def rank(parts, rows, words, models, value_words, quantity, package, limit=1):
+	"""Best matching rows as (score, row), best first, at most limit of them.
+
+	rows are the candidates that passed every check, in row order. words and
+	models are the rows found from the description words and from the model,
+	value_words the upper case words of the value and quantity the number of
+	parts needed."""
+	if not rows or limit < 1:
+		return []
+	share = _word_share(parts, rows, words, value_words)
+	quantity = max(quantity, 1)
+	arrays = parts.arrays()
+	if arrays is None:
+		return _rank_rows(parts, rows, share, models, quantity, package, limit)
+	return _rank_arrays(parts, arrays, rows, share, models, quantity, package, limit)
@@ -0,0 +1,601 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+from array import array
+import bisect
+from collections import namedtuple
+from itertools import accumulate
+import msgspec
+import mmap
+import os
+import re
+import struct
+import sys
+
+from .values import compatible, of_category, parse_value, value_range
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+TOLERANCE_RE = re.compile(r'±\d%$', re.M)
+
+# On-disk layout: magic, version, section count, then a directory of
+# (name, offset, length) entries. Every section is 8-byte aligned.
+DB_MAGIC = b'PCB2JLC\x00'
+DB_VERSION = 6
+# Older files can still be read to convert them: version 2 has no tokens columns, 3 no passives,
+# 4 takes values found in the description of any part for passives, 5 and older store an unused desc column
+DB_MIN_VERSION = 2
+_HEADER = struct.Struct('<8sII')
+_SECTION = struct.Struct('<16sQQ')
+
+# Columns stored as strings, in the order they are written
+STRING_COLUMNS = ('code', 'describe', 'model', 'model_upper', 'package', 'tokens_ohm', 'tokens_plain')
+
+
+def normalize_describe(describe):
+	return describe.upper()
+
+
+def normalize_word(word, ohm):
+	# Description word as _verify compares it, with the ohm symbol kept if the value has one
+	word = word.replace('OHMS', 'Ω') if ohm else word.replace('OHMS', '').replace('Ω', '')
+	if TOLERANCE_RE.match(word):
+		word = word[1:]
+	return word
+
+
+def desc_tokens(desc):
+	"""Normalized words of a description, with and without ohm symbols. Only resistors have any."""
+	words = desc.split(' ')
+	if 'RESISTOR' not in words and 'RESISTORS' not in words:
+		return (), ()
+	return tuple(sorted(set(normalize_word(w, True) for w in words))), tuple(sorted(set(normalize_word(w, False) for w in words)))
+
+
+def word_variants(word, resistor):
+	# Every form a description word can take once _verify has fixed the ohm symbol
+	if not resistor:
+		return (word,)
+	variants = set()
+	for w in (word, word.replace('OHMS', 'Ω'), word.replace('OHMS', '').replace('Ω', '')):
+		variants.add(w)
+		if TOLERANCE_RE.match(w):
+			variants.add(w[1:])
+	return variants
+
+
+def index_words(desc):
+	# Words a description is found by, its own and every form _verify can give them
+	words = desc.split(' ')
+	resistor = 'RESISTOR' in words or 'RESISTORS' in words
+	return set(w for word in set(words) for w in word_variants(word, resistor))
+
+
+def part_passive(part):
+	# Value of a resistor, capacitor or inductor, other parts have none even if their description gives one
+	passive = parse_value(part.describe)
+	if passive is None or not of_category(passive.kind, part.category or part.describe):
+		return None
+	return passive
+
+
+def passive_key(kind, package, category=''):
+	# Passive tables are keyed by kind, package and category, the keys of a kind and package share a prefix
+	return '{}|{}|{}'.format(kind, package, category)
+
+
+# Numeric columns as NumPy arrays indexed by row. Categories and packages are
+# ids, -1 for a package that isn't in the package index.
+PartArrays = namedtuple('PartArrays', 'stock price basic category package')
+
+
+class Part(msgspec.Struct, array_like=True, gc=False):
+	# Component as stored in the database and the cache, price is the unit price
+	code: str
+	describe: str
+	model: str
+	package: str
+	basic: bool
+	stock: int
+	price: float
+	category: str = ''
+
+
+class PartTable:
+	# Lookups shared by the in-memory index and the memory-mapped database
+
+	def __contains__(self, code):
+		return self.row_of(code) is not None
+
+	def __getitem__(self, code):
+		row = self.row_of(code)
+		if row is None:
+			raise KeyError(code)
+		return self.part(row)
+
+	def word_rows(self, value):
+		rows = None
+		for word in value.strip().split(' '):
+			postings = self.postings(word.upper())
+			if not postings:
+				return set()
+			rows = set(postings) if rows is None else rows.intersection(postings)
+			if not rows:
+				break
+		return rows
+
+	def resistor_rows(self):
+		# Rows whose description needs its ohm symbols fixed before words are compared
+		if self._resistors is None:
+			self._resistors = set(self.postings('RESISTOR') or ()) | set(self.postings('RESISTORS') or ())
+		return self._resistors
+
+	def model_rows(self, value):
+		if not value:
+			return set(range(len(self)))
+		return self._substring_rows('model_upper', value)
+
+	def package_rows(self, package):
+		# Rows with this package, or whose description names it
+		rows = self._package_sets.get(package)
+		if rows is None:
+			rows = self._package_sets[package] = set(self.package_postings(package)) | self._substring_rows('describe', package)
+		return rows
+
+	def parts_of(self, rows):
+		return [self.part(row) for row in rows]
+
+	def passive_rows(self, passive, package):
+		"""Rows of the given package, in a category of passive's kind, whose value equals passive's,
+		with a tolerance and voltage rating that fit"""
+		low, high = value_range(passive.value)
+		found = set()
+		for values, rows in self._passive_tables(passive_key(passive.kind, package)):
+			start, end = bisect.bisect_left(values, low), bisect.bisect_right(values, high)
+			found.update(row for row in rows[start:end] if compatible(passive, self.tolerance(row), self.voltage(row)))
+		return found
+
+	def arrays(self):
+		"""PartArrays of the table, None if NumPy isn't installed"""
+		if numpy is None:
+			return None
+		if self._arrays is None:
+			self._arrays = self._build_arrays()
+		return self._arrays
+
+	def filter_rows(self, rows, quantity, package):
+		"""Rows, in order, with at least quantity in stock (unless quantity is 0) and
+		the given package (unless empty), with the number removed by each check"""
+		arrays = self.arrays()
+		if arrays is None or not rows:
+			kept = [row for row in rows if self.stock(row) >= quantity]
+			no_stock = len(rows) - len(kept)
+			if package:
+				package_rows = self.package_rows(package)
+				kept = [row for row in kept if row in package_rows]
+			return kept, no_stock, len(rows) - no_stock - len(kept)
+		rows = numpy.fromiter(rows, numpy.intp, len(rows))
+		kept = rows[arrays.stock[rows] >= quantity]
+		no_stock = len(rows) - len(kept)
+		if package:
+			kept = kept[self._package_mask(package)[kept]]
+		return kept.tolist(), no_stock, len(rows) - no_stock - len(kept)
+
+	def _package_mask(self, package):
+		mask = self._package_masks.get(package)
+		if mask is None:
+			mask = self.arrays().package == self.package_id(package)
+			mask[list(self._substring_rows('describe', package))] = True
+			self._package_masks[package] = mask
+		return mask
+
+
+class PartIndex(PartTable):
+	# In-memory index, used for cached and online results
+
+	def __init__(self, parts=(), tokens=None):
+		self.parts = []
+		self.descs = []
+		self.tokens = []
+		self._passives = None
+		self.words = {}
+		self.packages = {}
+		self.rows = {}
+		self.update(parts, tokens)
+
+	def update(self, parts, tokens=None):
+		# Add or replace parts. Like dict.update, a replaced part keeps its row.
+		# tokens maps codes to desc_tokens() computed earlier, the others are computed here.
+		for part in parts:
+			row = self.rows.get(part.code)
+			if row is None:
+				row = self.rows[part.code] = len(self.parts)
+				self.parts.append(part)
+				self.descs.append(normalize_describe(part.describe))
+				self.tokens.append(self._token_sets(part, tokens))
+				if self._passives is not None:
+					self._passives.append(part_passive(part))
+				self._index_row(row)
+				continue
+			old = self.parts[row]
+			if old.describe != part.describe or old.package.upper() != part.package.upper():
+				self._index_row(row, remove=True)
+				self.parts[row] = part
+				self.descs[row] = normalize_describe(part.describe)
+				self.tokens[row] = self._token_sets(part, tokens)
+				if self._passives is not None:
+					self._passives[row] = part_passive(part)
+				self._index_row(row)
+			else:
+				self.parts[row] = part
+		self._package_sets = {}
+		self._package_masks = {}
+		self._resistors = None
+		self._arrays = None
+		self._joined = {}
+		self._passive_table = None
+
+	def passives(self):
+		# Passive values parsed from the descriptions, the first time they are needed
+		if self._passives is None:
+			self._passives = [part_passive(p) for p in self.parts]
+		return self._passives
+
+	def passive_table(self):
+		"""Values and rows of the passives of each kind, package and category, sorted by value"""
+		if self._passive_table is None:
+			table = {}
+			for row, (passive, part) in enumerate(zip(self.passives(), self.parts)):
+				if passive is not None:
+					key = passive_key(passive.kind, part.package.upper(), part.category)
+					table.setdefault(key, []).append((passive.value, row))
+			self._passive_table = {key: ([v for v, r in items], [r for v, r in items])
+								   for key, items in ((k, sorted(v)) for k, v in table.items())}
+			self._passive_keys = sorted(self._passive_table)
+		return self._passive_table
+
+	def _passive_tables(self, prefix):
+		table = self.passive_table()
+		keys = self._passive_keys
+		i = bisect.bisect_left(keys, prefix)
+		while i < len(keys) and keys[i].startswith(prefix):
+			yield table[keys[i]]
+			i += 1
+
+	def tolerance(self, row):
+		passive = self.passives()[row]
+		return passive and passive.tolerance
+
+	def voltage(self, row):
+		passive = self.passives()[row]
+		return passive and passive.voltage
+
+	def _token_sets(self, part, tokens):
+		known = tokens.get(part.code) if tokens else None
+		ohm, plain = known if known is not None else desc_tokens(normalize_describe(part.describe))
+		return frozenset(ohm), frozenset(plain)
+
+	def _index_row(self, row, remove=False):
+		keys = [(self.words, w) for w in index_words(self.descs[row])]
+		keys.append((self.packages, self.parts[row].package.upper()))
+		for table, key in keys:
+			if remove:
+				table[key].remove(row)
+			else:
+				table.setdefault(key, []).append(row)
+
+	def _build_arrays(self):
+		categories = {c: i for i, c in enumerate(sorted(set(p.category for p in self.parts)))}
+		self._package_ids = {package: i for i, package in enumerate(sorted(self.packages))}
+		return PartArrays(numpy.fromiter((p.stock for p in self.parts), numpy.int64, len(self.parts)),
+						  numpy.fromiter((p.price for p in self.parts), numpy.float64, len(self.parts)),
+						  numpy.fromiter((p.basic for p in self.parts), numpy.bool_, len(self.parts)),
+						  numpy.fromiter((categories[p.category] for p in self.parts), numpy.int64, len(self.parts)),
+						  numpy.fromiter((self._package_ids[p.package.upper()] for p in self.parts), numpy.int64, len(self.parts)))
+
+	def package_id(self, package):
+		return self._package_ids.get(package, -1)
+
+	def _join(self, column):
+		# Column joined in one string so substring lookups run in C, with the offset of each row
+		if column == 'model_upper':
+			values = [p.model.upper() for p in self.parts]
+		else:
+			values = [getattr(p, column) for p in self.parts]
+		offsets = [0]
+		offsets.extend(accumulate(len(v) + 1 for v in values))
+		self._joined[column] = '\x00'.join(values), offsets
+		return self._joined[column]
+
+	def __len__(self):
+		return len(self.parts)
+
+	def row_of(self, code):
+		return self.rows.get(code)
+
+	def part(self, row):
+		return self.parts[row]
+
+	def stock(self, row):
+		return self.parts[row].stock
+
+	def desc_tokens(self, row, ohm):
+		return self.tokens[row][0 if ohm else 1]
+
+	def postings(self, word):
+		return self.words.get(word)
+
+	def package_postings(self, package):
+		return self.packages.get(package, ())
+
+	def _substring_rows(self, column, value):
+		joined, offsets = self._joined.get(column) or self._join(column)
+		rows = set()
+		pos = joined.find(value)
+		while pos >= 0:
+			row = bisect.bisect_right(offsets, pos) - 1
+			rows.add(row)
+			pos = joined.find(value, offsets[row + 1])
+		return rows
+
+
+def _string_column(values):
+	encoded = [v.encode() for v in values]
+	offsets = array('I', [0])
+	for e in encoded:
+		offsets.append(offsets[-1] + len(e) + 1)
+	return offsets.tobytes(), b'\x00'.join(encoded) + b'\x00'
+
+
+def _term_table(mapping):
+	items = sorted((k.encode(), v) for k, v in mapping.items())
+	offsets, terms = _string_column([k.decode() for k, v in items])
+	starts = array('I', [0])
+	postings = array('I')
+	for k, v in items:
+		postings.extend(v)
+		starts.append(len(postings))
+	return offsets, terms, starts.tobytes(), postings.tobytes()
+
+
+def write_db(path, index, meta=None):
+	"""Write a PartIndex to path in the memory-mappable database format"""
+	parts = index.parts
+	sections = []
+
+	categories = sorted(set(p.category for p in parts))
+	meta = dict(meta or {})
+	meta.update({'count': len(parts), 'byteorder': sys.byteorder, 'categories': categories})
+	sections.append(('meta', msgspec.msgpack.encode(meta)))
+
+	sections.append(('stock', array('i', [p.stock for p in parts]).tobytes()))
+	sections.append(('price', array('d', [p.price for p in parts]).tobytes()))
+	sections.append(('basic', bytes(p.basic for p in parts)))
+	ids = {name: i for i, name in enumerate(categories)}
+	sections.append(('category', array('I', [ids[p.category] for p in parts]).tobytes()))
+
+	columns = {
+		'code': [p.code for p in parts],
+		'describe': [p.describe for p in parts],
+		'model': [p.model for p in parts],
+		'model_upper': [p.model.upper() for p in parts],
+		'package': [p.package for p in parts],
+		'tokens_ohm': [' '.join(sorted(t[0])) for t in index.tokens],
+		'tokens_plain': [' '.join(sorted(t[1])) for t in index.tokens],
+	}
+	for name in STRING_COLUMNS:
+		offsets, blob = _string_column(columns[name])
+		sections.append((name + '.off', offsets))
+		sections.append((name + '.str', blob))
+
+	nan = float('nan')
+	passives = index.passives()
+	sections.append(('tolerance', array('d', [nan if p is None or p.tolerance is None else p.tolerance for p in passives]).tobytes()))
+	sections.append(('voltage', array('d', [nan if p is None or p.voltage is None else p.voltage for p in passives]).tobytes()))
+
+	# Rows of each passive table are sorted by value, the values are stored next to them
+	passive_table = index.passive_table()
+	tables = {'codes': {code: [row] for code, row in index.rows.items()}, 'words': index.words, 'packages': index.packages,
+			  'passives': {key: rows for key, (values, rows) in passive_table.items()}}
+	values = array('d')
+	for key in sorted(passive_table, key=str.encode):
+		values.extend(passive_table[key][0])
+	sections.append(('passives.num', values.tobytes()))
+	for name, mapping in tables.items():
+		offsets, terms, starts, postings = _term_table(mapping)
+		sections.append((name + '.off', offsets))
+		sections.append((name + '.str', terms))
+		sections.append((name + '.idx', starts))
+		sections.append((name + '.row', postings))
+
+	# Lay out the sections after the header and directory
+	offset = _HEADER.size + _SECTION.size * len(sections)
+	directory = []
+	for name, data in sections:
+		offset += -offset % 8
+		directory.append(_SECTION.pack(name.encode(), offset, len(data)))
+		offset += len(data)
+
+	tmp_path = path + '.tmp'
+	with open(tmp_path, 'wb') as f:
+		f.write(_HEADER.pack(DB_MAGIC, DB_VERSION, len(sections)))
+		f.write(b''.join(directory))
+		for name, data in sections:
+			f.write(b'\x00' * (-f.tell() % 8))
+			f.write(data)
+	os.replace(tmp_path, path)
+
+
+def is_db_file(path):
+	with open(path, 'rb') as f:
+		return f.read(len(DB_MAGIC)) == DB_MAGIC
+
+
+class PartDB(PartTable):
+	# Read-only view of a database file. Opening only reads the section
+	# directory, parts are decoded when a lookup touches them.
+	# Files older than DB_VERSION only support part() and are meant to be converted.
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, self.version, count = _HEADER.unpack_from(self._mm, 0)
+		if magic != DB_MAGIC or not DB_MIN_VERSION <= self.version <= DB_VERSION:
+			self._mm.close()
+			raise ValueError('Unsupported database format')
+
+		self._sections = {}
+		self._views = []
+		for i in range(count):
+			name, offset, length = _SECTION.unpack_from(self._mm, _HEADER.size + i * _SECTION.size)
+			self._sections[name.rstrip(b'\x00').decode()] = (offset, length)
+
+		self.meta = msgspec.msgpack.decode(self._section('meta'))
+		if self.meta['byteorder'] != sys.byteorder:
+			raise ValueError('Database was built on a platform with a different byte order')
+		self._count = self.meta['count']
+		self._package_sets = {}
+		self._package_masks = {}
+		self._resistors = None
+		self._arrays = None
+
+		self._stock = self._view('stock', 'i')
+		self._price = self._view('price', 'd')
+		self._basic = self._view('basic', 'B')
+		self._category = self._view('category', 'I')
+		self._categories = self.meta['categories']
+		self._strings = {name: (self._view(name + '.off', 'I'), self._sections[name + '.str'][0])
+						 for name in STRING_COLUMNS if name + '.off' in self._sections}
+		self._tables = {}
+		for name in ('codes', 'words', 'packages', 'passives'):
+			if name + '.off' in self._sections:
+				self._tables[name] = (self._view(name + '.off', 'I'), self._sections[name + '.str'][0],
+									  self._view(name + '.idx', 'I'), self._view(name + '.row', 'I'))
+		if self.version >= 4:
+			self._tolerance = self._view('tolerance', 'd')
+			self._voltage = self._view('voltage', 'd')
+			self._passive_nums = self._view('passives.num', 'd')
+
+	def _section(self, name):
+		offset, length = self._sections[name]
+		return self._mm[offset:offset + length]
+
+	def _view(self, name, fmt):
+		offset, length = self._sections[name]
+		view = memoryview(self._mm)[offset:offset + length].cast(fmt)
+		self._views.append(view)
+		return view
+
+	def close(self):
+		self._arrays = None  # Arrays map the file too, they can't be used once it is closed
+		for view in self._views:
+			view.release()
+		self._views = []
+		self._mm.close()
+
+	def _string(self, column, row):
+		offsets, base = self._strings[column]
+		return self._mm[base + offsets[row]:base + offsets[row + 1] - 1].decode()
+
+	def _term_key(self, table, term):
+		offsets, base, starts, rows = self._tables[table]
+		return self._mm[base + offsets[term]:base + offsets[term + 1] - 1]
+
+	def _bound(self, table, key):
+		# Position of the first term of a table not below key
+		offsets = self._tables[table][0]
+		lo, hi = 0, len(offsets) - 1
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self._term_key(table, mid) < key:
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo
+
+	def _term(self, table, key):
+		# Position of key in a term table, None if it isn't there
+		key = key.encode()
+		term = self._bound(table, key)
+		if term < len(self._tables[table][0]) - 1 and self._term_key(table, term) == key:
+			return term
+		return None
+
+	def _lookup(self, table, key):
+		term = self._term(table, key)
+		if term is None:
+			return None
+		offsets, base, starts, rows = self._tables[table]
+		return rows[starts[term]:starts[term + 1]]
+
+	def _array(self, name, dtype):
+		offset, length = self._sections[name]
+		return numpy.frombuffer(self._mm, dtype, length // numpy.dtype(dtype).itemsize, offset)
+
+	def _build_arrays(self):
+		# Views of the mapped columns, only the package ids are computed, from the package index
+		offsets, base, starts, rows = self._tables['packages']
+		package = numpy.full(self._count, -1, numpy.int64)
+		package[self._array('packages.row', numpy.uint32)] = numpy.repeat(
+			numpy.arange(len(starts) - 1), numpy.diff(self._array('packages.idx', numpy.uint32)))
+		return PartArrays(self._array('stock', numpy.int32), self._array('price', numpy.float64),
+						  self._array('basic', numpy.bool_), self._array('category', numpy.uint32), package)
+
+	def package_id(self, package):
+		term = self._term('packages', package)
+		return -1 if term is None else term
+
+	def _passive_tables(self, prefix):
+		# Terms of every category of a kind and package follow each other
+		offsets, base, starts, rows = self._tables['passives']
+		prefix = prefix.encode()
+		term = self._bound('passives', prefix)
+		while term < len(offsets) - 1 and self._term_key('passives', term).startswith(prefix):
+			yield self._passive_nums[starts[term]:starts[term + 1]], rows[starts[term]:starts[term + 1]]
+			term += 1
+
+	def tolerance(self, row):
+		return self._tolerance[row]
+
+	def voltage(self, row):
+		return self._voltage[row]
+
+	def __len__(self):
+		return self._count
+
+	def row_of(self, code):
+		rows = self._lookup('codes', code)
+		return rows[0] if rows else None
+
+	def part(self, row):
+		return Part(self._string('code', row), self._string('describe', row), self._string('model', row),
+					self._string('package', row), bool(self._basic[row]), self._stock[row], self._price[row],
+					self._categories[self._category[row]])
+
+	def stock(self, row):
+		return self._stock[row]
+
+	def desc_tokens(self, row, ohm):
+		return frozenset(self._string('tokens_ohm' if ohm else 'tokens_plain', row).split(' '))
+
+	def postings(self, word):
+		return self._lookup('words', word)
+
+	def package_postings(self, package):
+		return self._lookup('packages', package) or ()
+
+	def _substring_rows(self, column, value):
+		offsets, base = self._strings[column]
+		end = base + offsets[self._count]
+		key = value.encode()
+		rows = set()
+		pos = self._mm.find(key, base, end)
+		while pos >= 0:
+			row = bisect.bisect_right(offsets, pos - base) - 1
+			rows.add(row)
+			pos = self._mm.find(key, base + offsets[row + 1], end)
+		return rows
@@ -0,0 +1,57 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import re
+
+
+# Package normalization rule. The first rule whose pattern is found in the given
+# field of a part decides: package(package, match) returns the package
+# to search for, value(value) the value, None keeps them, and desc is the part type.
+Rule = namedtuple('Rule', 'field pattern package desc value', defaults=(None, '', None))
+
+IGNORED_VALUE_RE = re.compile('^N[CBP]$')
+_RESISTOR_OHM_RE = re.compile(r'\d+R(\s\d%|$)', re.M)
+_RESISTOR_DOT_RE = re.compile(r'\d+R\d+', re.M)
+
+
+def resistor_value(value):
+	if _RESISTOR_OHM_RE.search(value):
+		value = value.replace('R', 'Ω')
+	elif _RESISTOR_DOT_RE.search(value):
+		value = value.replace('R', '.')
+	if not value.endswith('Ω') and not value.endswith('%'):
+		value += 'Ω'
+	return value
+
+
+def split_package(package, match):
+	return package.split('_')[1]
+
+
+def group_package(package, match):
+	return match.group(1)
+
+
+def add_rule(rules, field, pattern, package=None, desc='', value=None, index=None):
+	"""Add a rule to a table, at the end unless index is given"""
+	if isinstance(pattern, str):
+		pattern = re.compile(pattern, re.M)
+	rule = Rule(field, pattern, package, desc, value)
+	if index is None:
+		rules.append(rule)
+	else:
+		rules.insert(index, rule)
+
+
+def normalize(fields, package, value, *tables):
+	for rules in tables:
+		for rule in rules:
+			m = rule.pattern.search(fields[rule.field])
+			if m:
+				if rule.package:
+					package = rule.package(package, m)
+				if rule.value:
+					value = rule.value(value)
+				return package, value, rule.desc
+	return package, value, ''
@@ -0,0 +1,181 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+import msgspec
+import os
+import sqlite3
+import string
+
+from .partdb import Part, PartTable, index_words
+from .values import compatible, value_range
+
+
+SQLITE_VERSION = 2  # Version 1 took values found in the description of any part for passives
+
+# Description words are only split on spaces, like PartIndex does: every other
+# ASCII character is part of a word, and so is anything outside ASCII
+_WORD_CHARS = ''.join(c for c in map(chr, range(1, 128)) if c != ' ' and c not in string.ascii_letters + string.digits)
+_WORDS_TOKENIZER = 'ascii tokenchars ' + "'" + _WORD_CHARS.replace("'", "''") + "'"
+
+_SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE parts (
+	row INTEGER PRIMARY KEY, code TEXT NOT NULL, describe TEXT NOT NULL, model TEXT NOT NULL, package TEXT NOT NULL,
+	basic INTEGER NOT NULL, stock INTEGER NOT NULL, price REAL NOT NULL, category TEXT NOT NULL,
+	desc TEXT NOT NULL, model_upper TEXT NOT NULL, package_upper TEXT NOT NULL, tokens_ohm TEXT NOT NULL, tokens_plain TEXT NOT NULL,
+	kind TEXT, value REAL, tolerance REAL, voltage REAL
+);
+CREATE VIRTUAL TABLE words USING fts5(word, content='', columnsize=0, detail='none', tokenize={0});
+CREATE VIRTUAL TABLE substrings USING fts5(model_upper, describe, content='parts', content_rowid='row', tokenize='trigram case_sensitive 1');
+'''.format("'" + _WORDS_TOKENIZER.replace("'", "''") + "'")
+
+# Built once the rows are in, it is faster than updating them row by row
+_INDEXES = '''
+CREATE UNIQUE INDEX parts_code ON parts (code);
+CREATE INDEX parts_package ON parts (package_upper);
+CREATE INDEX parts_category ON parts (category);
+CREATE INDEX parts_passive ON parts (kind, package_upper, value) WHERE kind IS NOT NULL;
+INSERT INTO substrings (substrings) VALUES ('rebuild');
+INSERT INTO words (words) VALUES ('optimize');
+INSERT INTO substrings (substrings) VALUES ('optimize');
+'''
+
+_PART_COLUMNS = 'code, describe, model, package, basic, stock, price, category'
+
+
+def _phrase(text):
+	return '"' + text.replace('"', '""') + '"'
+
+
+def write_sqlite(path, index, meta=None):
+	"""Write a PartIndex to path as an SQLite database"""
+	meta = dict(meta or {})
+	meta.update({'version': SQLITE_VERSION, 'count': len(index)})
+
+	tmp_path = path + '.tmp'
+	if os.path.exists(tmp_path):
+		os.remove(tmp_path)
+	db = sqlite3.connect(tmp_path)
+	try:
+		db.execute('PRAGMA journal_mode = OFF')
+		db.execute('PRAGMA synchronous = OFF')
+		db.executescript(_SCHEMA)
+		db.executemany('INSERT INTO meta VALUES (?, ?)', ((k, msgspec.json.encode(v).decode()) for k, v in meta.items()))
+
+		def rows():
+			for row, (part, desc, tokens, passive) in enumerate(zip(index.parts, index.descs, index.tokens, index.passives())):
+				yield (row, part.code, part.describe, part.model, part.package, part.basic, part.stock, part.price, part.category,
+					   desc, part.model.upper(), part.package.upper(), ' '.join(sorted(tokens[0])), ' '.join(sorted(tokens[1])),
+					   *(passive or (None, None, None, None)))
+		db.executemany('INSERT INTO parts VALUES ({})'.format(', '.join('?' * 18)), rows())
+		db.executemany('INSERT INTO words (rowid, word) VALUES (?, ?)',
+					   ((row, ' '.join(index_words(desc))) for row, desc in enumerate(index.descs)))
+		db.executescript(_INDEXES)
+		db.commit()
+	finally:
+		db.close()
+	os.replace(tmp_path, path)
+
+
+class SqlitePartDB(PartTable):
+	# Read-only view of an SQLite database. Every lookup is an indexed query, nothing
+	# is loaded up front, and any number of processes can read the file at once.
+
+	def __init__(self, path):
+		if not os.path.exists(path):
+			raise OSError('No such file: ' + path)
+		self._db = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True, check_same_thread=False)
+		try:
+			self.meta = {k: msgspec.json.decode(v) for k, v in self._db.execute('SELECT key, value FROM meta')}
+		except sqlite3.DatabaseError:
+			self._db.close()
+			raise ValueError('Unsupported database format')
+		self.version = self.meta.get('version')
+		if self.version != SQLITE_VERSION:
+			self._db.close()
+			raise ValueError('Unsupported database format')
+		self._count = self.meta['count']
+		self._package_sets = {}
+		self._resistors = None
+
+	def close(self):
+		self._db.close()
+
+	def _column(self, column, row):
+		r = self._db.execute('SELECT {} FROM parts WHERE row = ?'.format(column), (row,)).fetchone()
+		return r[0]
+
+	def _rows(self, query, *params):
+		return set(r for r, in self._db.execute(query, params))
+
+	def arrays(self):
+		return None
+
+	def __len__(self):
+		return self._count
+
+	def row_of(self, code):
+		r = self._db.execute('SELECT row FROM parts WHERE code = ?', (code,)).fetchone()
+		return r and r[0]
+
+	def part(self, row):
+		return self.parts_of((row,))[0]
+
+	def parts_of(self, rows):
+		found = {r[0]: Part(*r[1:5], bool(r[5]), *r[6:]) for r in self._db.execute(
+			'SELECT row, {} FROM parts WHERE row IN (SELECT j.value FROM json_each(?) AS j)'.format(_PART_COLUMNS),
+			(msgspec.json.encode(list(rows)).decode(),))}
+		return [found[row] for row in rows]
+
+	def stock(self, row):
+		return self._column('stock', row)
+
+	def desc_tokens(self, row, ohm):
+		return frozenset(self._column('tokens_ohm' if ohm else 'tokens_plain', row).split(' '))
+
+	def word_rows(self, value):
+		# All the words in one full-text query
+		words = [word.upper() for word in value.strip().split(' ')]
+		if '' in words:
+			return super().word_rows(value)
+		return self._rows('SELECT rowid FROM words WHERE words MATCH ?', ' '.join(map(_phrase, words)))
+
+	def postings(self, word):
+		if not word:
+			# Empty words come from repeated spaces, the tokenizer drops them
+			rows = self._rows("SELECT row FROM parts WHERE desc = '' OR instr(desc, '  ') OR desc LIKE ' %' OR desc LIKE '% '")
+		else:
+			rows = self._rows('SELECT rowid FROM words WHERE words MATCH ?', _phrase(word))
+		return sorted(rows) or None
+
+	def package_postings(self, package):
+		return self._rows('SELECT row FROM parts WHERE package_upper = ?', package)
+
+	def _substring_rows(self, column, value):
+		# Trigrams only find values of 3 characters or more, shorter ones scan the column
+		if len(value) < 3:
+			return self._rows('SELECT row FROM parts WHERE instr({}, ?)'.format(column), value)
+		return self._rows('SELECT rowid FROM substrings WHERE substrings MATCH ? AND instr({}, ?)'.format(column),
+						  '{} : {}'.format(column, _phrase(value)), value)
+
+	def passive_rows(self, passive, package):
+		low, high = value_range(passive.value)
+		return set(row for row, tolerance, voltage in self._db.execute(
+			'SELECT row, tolerance, voltage FROM parts WHERE kind = ? AND package_upper = ? AND value BETWEEN ? AND ?',
+			(passive.kind, package, low, high)) if compatible(passive, tolerance, voltage))
+
+	def filter_rows(self, rows, quantity, package):
+		# Stock and package of every row in one query, the description is only searched for these rows
+		checks = self._db.execute(
+			'SELECT p.row, p.stock >= ?, ? = \'\' OR p.package_upper = ? OR instr(p.describe, ?) '
+			'FROM json_each(?) AS j JOIN parts AS p ON p.row = j.value ORDER BY j.key',
+			(quantity, package, package, package, msgspec.json.encode(list(rows)).decode()))
+		kept, no_stock, no_package = [], 0, 0
+		for row, in_stock, has_package in checks:
+			if not in_stock:
+				no_stock += 1
+			elif not has_package:
+				no_package += 1
+			else:
+				kept.append(row)
+		return kept, no_stock, no_package
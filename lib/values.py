@@ -0,0 +1,96 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import math
+import re
+
+
+# Value of a passive part in base units (ohm, farad, henry). Tolerance is in
+# percent and voltage is the rating in volts, both None when not given.
+Passive = namedtuple('Passive', 'kind value tolerance voltage')
+
+KINDS = ('resistance', 'capacitance', 'inductance')
+# Kind of value of each part type the board rules give
+PART_KINDS = {'RESISTOR': 'resistance', 'CAPACITOR': 'capacitance', 'INDUCTOR': 'inductance'}
+VALUE_TOLERANCE = 1e-6  # Relative difference under which two values are the same
+
+_PREFIXES = {'p': 1e-12, 'P': 1e-12, 'n': 1e-9, 'N': 1e-9, 'u': 1e-6, 'U': 1e-6, 'µ': 1e-6, 'μ': 1e-6, 'm': 1e-3,
+			 '': 1.0, 'k': 1e3, 'K': 1e3, 'M': 1e6, 'G': 1e9}
+_UNITS = {'Ω': 'resistance', 'OHM': 'resistance', 'OHMS': 'resistance', 'ohm': 'resistance', 'ohms': 'resistance',
+		  'R': 'resistance', 'F': 'capacitance', 'H': 'inductance'}
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_QUANTITY_RE = re.compile(r'(?<![\w.\-])' + _NUMBER + r'\s?([pnuµμmkKMGPNU]?)(Ω|OHMS?|ohms?|F|H)(?![A-Za-z])')
+# 4K7, 2R2, 4N7: the prefix or R stands for the decimal point
+_INFIX_RE = re.compile(r'(?<![\w.\-])(\d+)([pnuµμkKMGPNUR])(\d+)(Ω|F|H)?(?![\w.])')
+# A number and a prefix without unit, like 100N or 4.7U, is a capacitor unless the part type says otherwise.
+# Larger prefixes, like the 10K of a resistor whose tolerance kept the ohm symbol off, need the part type.
+_BARE_RE = re.compile(r'(?<![\w.\-])' + _NUMBER + r'([pnuµμPNU])(?![\w.])')
+_BARE_TYPED_RE = re.compile(r'(?<![\w.\-])' + _NUMBER + r'([pnuµμPNUkKMG])(?![\w.])')
+_TOLERANCE_RE = re.compile(r'±?' + _NUMBER + r'%')
+_VOLTAGE_RE = re.compile(r'(?<![\w.])' + _NUMBER + r'\s?(k|K)?V(?![A-Za-z])')
+# Catalogue categories whose parts are of each kind, other parts can give such values
+# too, like the capacitance of a TVS diode
+_CATEGORY_RES = {'resistance': re.compile('RESISTOR', re.I), 'capacitance': re.compile('CAPACITOR', re.I),
+				 'inductance': re.compile('INDUCTOR', re.I)}
+
+
+def _scale(number, prefix, kind, upper):
+	# Upper case text can't tell milli from mega: M is mega for ohms, milli otherwise
+	if upper and prefix == 'M' and kind != 'resistance':
+		return float(number) * 1e-3
+	return float(number) * _PREFIXES[prefix]
+
+
+def parse_value(text, upper=False, kind=None):
+	"""Passive for the first resistance, capacitance or inductance in text, None if there is none.
+
+	upper is for upper case text such as board values, where M is milli except for ohms.
+	kind is what a value without unit is, when the type of the part is known."""
+	best = None
+	m = _QUANTITY_RE.search(text)
+	if m:
+		found = _UNITS[m.group(3)]
+		best = (m.start(), found, _scale(m.group(1), m.group(2), found, upper))
+	m = _INFIX_RE.search(text)
+	if m and (best is None or m.start() < best[0]):
+		prefix, unit = m.group(2), m.group(4)
+		if prefix == 'R' or unit == 'Ω':
+			found = 'resistance'
+		elif unit:
+			found = _UNITS[unit]
+		else:
+			found = kind or ('resistance' if prefix in 'kKMG' else 'capacitance')
+		number = '{}.{}'.format(m.group(1), m.group(3))
+		best = (m.start(), found, _scale(number, '' if prefix == 'R' else prefix, found, upper))
+	m = (_BARE_TYPED_RE if kind else _BARE_RE).search(text)
+	if m and (best is None or m.start() < best[0]):
+		found = kind or 'capacitance'
+		best = (m.start(), found, _scale(m.group(1), m.group(2), found, upper))
+	if best is None:
+		return None
+
+	tolerance = _TOLERANCE_RE.search(text)
+	voltage = _VOLTAGE_RE.search(text)
+	return Passive(best[1], best[2], float(tolerance.group(1)) if tolerance else None,
+				   float(voltage.group(1)) * (1e3 if voltage.group(2) else 1.0) if voltage else None)
+
+
+def of_category(kind, category):
+	"""Whether parts of the catalogue category, or with this description if the category is unknown, are of the kind"""
+	return bool(_CATEGORY_RES[kind].search(category))
+
+
+def value_range(value):
+	"""Bounds of the values equal to value"""
+	return value * (1 - VALUE_TOLERANCE), value * (1 + VALUE_TOLERANCE)
+
+
+def compatible(wanted, tolerance, voltage):
+	# A part is at least as precise and rated for at least the voltage asked for, unknown is not enough
+	if wanted.tolerance is not None and (tolerance is None or math.isnan(tolerance) or tolerance > wanted.tolerance):
+		return False
+	if wanted.voltage is not None and (voltage is None or math.isnan(voltage) or voltage < wanted.voltage):
+		return False
+	return True
@@ -0,0 +1,126 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import msgspec
+import xlsxwriter
+
+from .instrument import span
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+
+class Writer:
+	# Output table that rows are streamed into, one call per row in file order
+
+	def __init__(self, path, header, widths=()):
+		self.path = path
+		self.header = tuple(header)
+
+	def write(self, row):
+		raise NotImplementedError
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		with span('write'):
+			self.close()
+
+
+class XlsxWriter(Writer):
+	# Rows are written in order, so each one can be flushed to disk as soon as it is complete
+
+	def __init__(self, path, header, widths=()):
+		super().__init__(path, header)
+		self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+		self.sheet = self.workbook.add_worksheet()
+		for first, last, width in widths:
+			self.sheet.set_column(first, last, width)
+		self.sheet.write_row(0, 0, self.header)
+		self.line = 1
+
+	def write(self, row):
+		self.sheet.write_row(self.line, 0, row)
+		self.line += 1
+
+	def close(self):
+		self.workbook.close()
+
+
+class CsvWriter(Writer):
+
+	def __init__(self, path, header, widths=()):
+		super().__init__(path, header)
+		self.file = open(path, 'w', newline='', encoding='utf-8')
+		self.writer = csv.writer(self.file)
+		self.writer.writerow(self.header)
+
+	def write(self, row):
+		self.writer.writerow(row)
+
+	def close(self):
+		self.file.close()
+
+
+class JsonlWriter(Writer):
+	# One JSON object per line, keyed by the column names
+
+	def __init__(self, path, header, widths=()):
+		super().__init__(path, header)
+		self.file = open(path, 'wb')
+		self.encoder = msgspec.json.Encoder()
+
+	def write(self, row):
+		self.file.write(self.encoder.encode(dict(zip(self.header, row))))
+		self.file.write(b'\n')
+
+	def close(self):
+		self.file.close()
+
+
+class ParquetWriter(Writer):
+	# Columns are stored as strings, rows are buffered and written in batches
+
+	BATCH_SIZE = 4096
+
+	def __init__(self, path, header, widths=()):
+		super().__init__(path, header)
+		self.schema = pyarrow.schema([(name, pyarrow.string()) for name in self.header])
+		self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+		self.rows = []
+
+	def write(self, row):
+		self.rows.append(row)
+		if len(self.rows) >= self.BATCH_SIZE:
+			self._flush()
+
+	def _flush(self):
+		columns = [pyarrow.array([str(v) for v in c], pyarrow.string()) for c in zip(*self.rows)]
+		self.writer.write_batch(pyarrow.RecordBatch.from_arrays(columns, schema=self.schema))
+		self.rows = []
+
+	def close(self):
+		if self.rows:
+			self._flush()
+		self.writer.close()
+
+
+WRITERS = {'xlsx': XlsxWriter, 'csv': CsvWriter, 'jsonl': JsonlWriter}
+if pyarrow is not None:
+	WRITERS['parquet'] = ParquetWriter
+
+
+def open_writer(path, header, widths=()):
+	"""Writer for path, picked from its extension"""
+	extension = path.rsplit('.', 1)[-1].lower()
+	if extension not in WRITERS:
+		raise ValueError('Unsupported output format: {}'.format(extension))
+	return WRITERS[extension](path, header, widths)
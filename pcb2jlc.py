@@ -1,15 +1,38 @@
 #!/bin/env python3
 # -*- coding: utf-8 -*-
 
-from argparse import ArgumentParser
-from os.path import splitext, basename
+from argparse import ArgumentParser, ArgumentTypeError
+import cProfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import gc
+from glob import glob
+from itertools import repeat
+from os.path import splitext, basename, isdir, join
+import sys
+import time
 from lib import *
 
+BOARD_EXTENSIONS = ('.kicad_pcb', '.brd')
+
+
+def positive_int(text):
+	value = int(text)
+	if value < 1:
+		raise ArgumentTypeError('must be at least 1')
+	return value
+
+
 parser = ArgumentParser(
 	description='Generate JLCPCB bom and cpl files from a PCB file')
-parser.add_argument('pcb', type=str, help='PCB board file. Can be Eagle (.brd) or Kicad (.kicad_pcb)')
+parser.add_argument('pcb', type=str, nargs='+',
+					help='PCB board files, directories or glob patterns. Can be Eagle (.brd) or Kicad (.kicad_pcb)')
 parser.add_argument('-c', '--cache', action='store_true',
 					help='Use cache to speed up searching')
+parser.add_argument('--cache-ttl', type=float, default=jlc.CACHE_TTL / 3600,
+					help='Hours before cached parts and searches expire')
+parser.add_argument('--cache-size', type=int, default=jlc.CACHE_MAX_PARTS,
+					help='Maximum number of cached parts, least recently used are dropped first')
 parser.add_argument('-u', '--update', action='store_true',
 					help='Update JLCPCB component database')
 parser.add_argument('-o', '--offline', action='store_true',
@@ -20,36 +43,178 @@ parser.add_argument('-n', '--nostock', action='store_true',
 					help='Select part even if no stock')
 parser.add_argument('-i', '--ignore', type=str,
 					help='Ignored parts (regex)')
+parser.add_argument('--incremental', action='store_true',
+					help='Only download database categories that changed or expired')
+parser.add_argument('--ttl', type=float, default=jlc.DB_TTL / 3600,
+					help='Hours before an unchanged category is downloaded again with --incremental')
+parser.add_argument('--backend', choices=tuple(jlc.DB_BACKENDS), default='file',
+					help='Storage of the offline database, sqlite files can be queried by other programs')
+parser.add_argument('-j', '--jobs', type=positive_int, default=8,
+					help='Number of parallel API requests')
+parser.add_argument('--rate', type=float, default=10.0,
+					help='Maximum API requests per second, 0 to disable')
+parser.add_argument('-m', '--matches', type=positive_int, default=1,
+					help='Best matching parts listed for each offline BOM line')
+parser.add_argument('-f', '--format', choices=jlc.OUTPUT_FORMATS, default='xlsx',
+					help='Format of the BOM and CPL files')
+parser.add_argument('--profile', type=str,
+					help='Write the time spent in each stage and event counts to this JSON file, or cProfile stats if it ends with .prof')
+parser.add_argument('-p', '--processes', type=positive_int,
+					help='Number of processes parsing boards when several are given, defaults to the CPU count')
 
-if __name__ == '__main__':
 
-	args = parser.parse_args()
+def board_files(paths):
+	boards = []
+	for path in paths:
+		if isdir(path):
+			boards.extend(sorted(f for f in glob(join(path, '*')) if f.endswith(BOARD_EXTENSIONS)))
+		elif any(c in path for c in '*?['):
+			boards.extend(sorted(glob(path)))
+		else:
+			boards.append(path)
+	return list(dict.fromkeys(boards))
+
+
+def output_names(boards):
+	# Board file names without extension, unless several boards would write to the same files
+	names = [splitext(basename(path))[0] for path in boards]
+	names = [name if names.count(name) == 1 else basename(path).replace('.', '-') for name, path in zip(names, boards)]
+	return [name if names.count(name) == 1 else '{0}-{1}'.format(name, i + 1) for i, name in enumerate(names)]
+
+
+def line_writer(bom, cpl):
+	def write_line(part, data):
+		with instrument.span('write'):
+			bom.write(jlc.bom_row(part, data))
+			for row in jlc.cpl_rows(part, data):
+				cpl.write(row)
+	return write_line
+
+
+def read_board(path, ignore=None):
+	# Boards can be read by worker processes, what they record is sent back with the components.
+	# The parsed board holds no reference cycles, the cyclic garbage collector would only keep
+	# rescanning it as it grows, so it is paused. No search runs while a board is read.
+	gc_enabled = gc.isenabled()
+	gc.disable()
+	try:
+		with instrument.recording() as recorder:
+			with instrument.span('get_components'):
+				if path.endswith('.kicad_pcb'):
+					by_layer = kicad.get_components_by_layer(path, ignore)
+				else:
+					by_layer = eagle.get_components_by_layer(path, ignore)
+	finally:
+		if gc_enabled:
+			gc.enable()
+	return by_layer, recorder.spans['get_components'][1], recorder.report()
+
+
+def main(args):
 	db = None
 
 	if args.update:
-		jlc.update_db()
+		with instrument.span('update_db'):
+			jlc.update_db(jobs=args.jobs, rate=args.rate, incremental=args.incremental, ttl=args.ttl * 3600, backend=args.backend)
 
 	if args.offline:
-		db = jlc.load_db()
+		with instrument.span('load_db'):
+			db = jlc.load_db(args.backend)
 
-	base_name = splitext(basename(args.pcb))[0]
-
-	for layer in ('top', 'bottom'):
-		print('**', layer, 'layer **')
-		if args.pcb.endswith('.kicad_pcb'):
-			components = kicad.get_components(args.pcb, layer, args.ignore)
-		elif args.pcb.endswith('.brd'):
-			components = eagle.get_components(args.pcb, layer, args.ignore)
-		else:
+	boards = board_files(args.pcb)
+	if not boards:
+		print('No board files found')
+		exit(1)
+	for path in boards:
+		if not path.endswith(BOARD_EXTENSIONS):
 			print('Unknown board file extension, use --help')
 			exit(1)
 
-		print('getting components...')
-		parts = jlc.search(components, database=db, use_cache=args.cache, nostock=args.nostock, strict=args.strict, limit=1)
+	cache = None
+	if args.cache:
+		# Loaded once and written once for all boards
+		cache = jlc.PartCache(ttl=args.cache_ttl * 3600, max_parts=args.cache_size)
+		with instrument.span('load_cache'):
+			cache.load()
+
+	# Boards are parsed by worker processes while the ones already parsed are matched here,
+	# against a single copy of the database and cache
+	pool = None
+	if len(boards) > 1 and args.processes != 1:
+		pool = ProcessPoolExecutor(args.processes)
+		boards_read = pool.map(read_board, boards, repeat(args.ignore))
+	else:
+		boards_read = (read_board(path, args.ignore) for path in boards)
+
+	summary = []
+	try:
+		for path, base_name, (by_layer, parse_time, report) in zip(boards, output_names(boards), boards_read):
+			instrument.recorder.merge(report)
+			if len(boards) > 1:
+				print('*****', path, '*****')
+			start = time.perf_counter()
+			lines = found = count = matched = 0
+
+			for layer in ('top', 'bottom'):
+				print('**', layer, 'layer **')
+				components = by_layer[layer]
+
+				print('getting components...')
+				with instrument.span('search'), ExitStack() as outputs:
+					on_line = None
+					if components:
+						# BOM and CPL rows are written as soon as each line is resolved
+						bom = outputs.enter_context(jlc.open_bom('{0}-{1}-bom.{2}'.format(base_name, layer, args.format)))
+						cpl = outputs.enter_context(jlc.open_cpl('{0}-{1}-cpl.{2}'.format(base_name, layer, args.format)))
+						on_line = line_writer(bom, cpl)
+					parts = jlc.search(components, database=db, use_cache=args.cache, nostock=args.nostock, strict=args.strict, limit=1, jobs=args.jobs, rate=args.rate,
+										cache_ttl=args.cache_ttl * 3600, cache_size=args.cache_size, cache=cache, on_line=on_line,
+										matches=args.matches)
+
+				for v in parts.values():
+					lines += 1
+					count += len(v['parts'])
+					if v['jlc']['code']:
+						found += 1
+						matched += len(v['parts'])
 
-		if not parts:
-			print('No components found, skipping')
-			continue
-		
-		jlc.make_bom(parts, '{0}-{1}-bom.xlsx'.format(base_name, layer))
-		jlc.make_cpl(parts, '{0}-{1}-cpl.xlsx'.format(base_name, layer))
+				if not parts:
+					print('No components found, skipping')
+
+			summary.append((path, parse_time, time.perf_counter() - start, lines, found, count, matched))
+			instrument.count('boards')
+			instrument.count('bom_lines', lines)
+			instrument.count('bom_lines_found', found)
+	finally:
+		if pool:
+			pool.shutdown(cancel_futures=True)
+		if cache:
+			with instrument.span('flush_cache'):
+				cache.flush()
+
+	if len(boards) > 1:
+		print('Summary:')
+		print('{0:40s} {1:>8s} {2:>8s} {3:>11s} {4:>11s}'.format('Board', 'Parse', 'Search', 'BOM lines', 'Parts'))
+		for path, parse_time, search_time, lines, found, count, matched in summary:
+			print('{0:40s} {1:7.2f}s {2:7.2f}s {3:>11s} {4:>11s}'.format(
+				path, parse_time, search_time, '{}/{}'.format(found, lines), '{}/{}'.format(matched, count)))
+		lines = sum(s[3] for s in summary)
+		found = sum(s[4] for s in summary)
+		print('{0} boards, {1}/{2} BOM lines matched ({3:.0%})'.format(len(summary), found, lines, found / lines if lines else 0))
+
+
+if __name__ == '__main__':
+
+	args = parser.parse_args()
+	if not args.profile:
+		main(args)
+	elif args.profile.endswith('.prof'):
+		# Read with python -m pstats
+		cProfile.run('main(args)', args.profile)
+	else:
+		started = time.time()
+		start = time.perf_counter()
+		try:
+			main(args)
+		finally:
+			instrument.write_report(args.profile, argv=sys.argv[1:], started=started, seconds=time.perf_counter() - start)